@@ -30,3 +30,7 @@ from django.utils.translation import gettext_lazy as _
 class OsisSignatureConfig(AppConfig):
     name = 'osis_signature'
     verbose_name = _("Signatures")
+
+    def ready(self):
+        # Connect signal receivers used for read-after-write routing
+        from osis_signature import routers  # noqa
@@ -0,0 +1,128 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from collections import defaultdict, namedtuple
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from osis_signature.hashing import compute_state_hash
+from osis_signature.models import Actor, StateHistory, StateHistoryCheckpoint
+from osis_signature.routers import pin_to_primary
+
+VERIFICATION_BATCH_SIZE = 1000
+
+ChainIssue = namedtuple('ChainIssue', ['actor_id', 'sequence', 'message'])
+HistoryVerification = namedtuple('HistoryVerification', ['verified', 'issues'])
+
+
+def get_unverified_actors(full=False):
+    """Actors whose state history has entries after their checkpoint (or whose checkpointed entry is gone)"""
+    queryset = models.QuerySet(Actor)
+    if full:
+        # Including actors whose entries have all been deleted since verified
+        return queryset.filter(models.Q(states__isnull=False) | models.Q(history_checkpoint__isnull=False)).distinct()
+    return queryset.annotate(
+        last_sequence=Coalesce(
+            models.Subquery(
+                StateHistory.objects.filter(actor=models.OuterRef('pk')).order_by('-sequence').values('sequence')[:1]
+            ),
+            0,
+        ),
+        checkpoint_sequence=Coalesce(
+            models.Subquery(StateHistoryCheckpoint.objects.filter(actor=models.OuterRef('pk')).values('sequence')),
+            0,
+        ),
+    ).exclude(last_sequence=models.F('checkpoint_sequence'))
+
+
+def verify_state_history(full=False, batch_size=VERIFICATION_BATCH_SIZE):
+    """
+    Verify the hash chains of state histories, by batches of actors, and return the number of entries verified and the
+    issues found (at most one per actor, its chain being broken from there).
+
+    The checkpointed entry of each actor is compared to its recorded hash and, unless full, only entries after it are
+    hashed. Checkpoints are then moved to the last entry verified.
+    """
+    pks = list(get_unverified_actors(full).order_by('pk').values_list('pk', flat=True))
+    verified = 0
+    issues = []
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        checkpoints = StateHistoryCheckpoint.objects.in_bulk(batch)
+        entries = StateHistory.objects.filter(actor__in=batch)
+        if not full:
+            entries = entries.filter(sequence__gte=Coalesce(
+                models.Subquery(
+                    StateHistoryCheckpoint.objects.filter(actor=models.OuterRef('actor')).values('sequence')
+                ),
+                0,
+            ))
+        entries_by_actor = defaultdict(list)
+        for entry in entries.order_by('actor', 'sequence').values_list(
+            'actor', 'sequence', 'state', 'created_at', 'hash', named=True
+        ):
+            entries_by_actor[entry.actor].append(entry)
+
+        now = timezone.now()
+        new_checkpoints, moved_checkpoints = [], []
+        for actor_id in batch:
+            actor_entries = entries_by_actor[actor_id]
+            checkpoint = checkpoints.get(actor_id)
+            previous_hash = ''
+            if checkpoint:
+                checkpointed = next((entry for entry in actor_entries if entry.sequence == checkpoint.sequence), None)
+                if not checkpointed or checkpointed.hash != checkpoint.hash:
+                    issues.append(ChainIssue(actor_id, checkpoint.sequence, "Verified entry changed or deleted"))
+                    continue
+                if not full:
+                    previous_hash = checkpointed.hash
+                    actor_entries = actor_entries[1:]
+            last_verified = None
+            for entry in actor_entries:
+                expected_hash = compute_state_hash(
+                    actor_id, entry.sequence, entry.state, entry.created_at, previous_hash
+                )
+                if expected_hash != entry.hash:
+                    issues.append(ChainIssue(actor_id, entry.sequence, "Entry, or a previous one, changed or deleted"))
+                    break
+                previous_hash = entry.hash
+                last_verified = entry
+                verified += 1
+            if last_verified is None:
+                continue
+            values = {'sequence': last_verified.sequence, 'hash': last_verified.hash, 'verified_at': now}
+            if checkpoint:
+                for field, value in values.items():
+                    setattr(checkpoint, field, value)
+                moved_checkpoints.append(checkpoint)
+            else:
+                new_checkpoints.append(StateHistoryCheckpoint(actor_id=actor_id, **values))
+        with transaction.atomic():
+            StateHistoryCheckpoint.objects.bulk_create(new_checkpoints)
+            StateHistoryCheckpoint.objects.bulk_update(moved_checkpoints, ['sequence', 'hash', 'verified_at'])
+        pin_to_primary()
+    return HistoryVerification(verified, issues)
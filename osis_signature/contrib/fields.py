@@ -29,7 +29,7 @@ from django.db.models.fields.related_lookups import RelatedLookupMixin
 from django.utils.translation import gettext_lazy as _
 
 from osis_signature.enums import SignatureState
-from osis_signature.models import Actor
+from osis_signature.models import Actor, Process
 
 
 class SignatureProcessField(models.ForeignKey):
@@ -61,3 +61,41 @@ class AllSignedLookup(RelatedLookupMixin, models.Lookup):
             return "NOT EXISTS(%s)" % sql, params
         else:
             return "EXISTS(%s)" % sql, params
+
+
+@SignatureProcessField.register_lookup
+class IsCompleteLookup(RelatedLookupMixin, models.Lookup):
+    """Whether the completion rule of the process is met, compiled to a single aggregate subquery"""
+
+    lookup_name = 'is_complete'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        sql, params = compiler.compile(Process.objects.filter(pk=self.lhs).complete().values('pk').query)
+        if self.rhs:
+            return "EXISTS(%s)" % sql, params
+        else:
+            return "NOT EXISTS(%s)" % sql, params
+
+
+def get_signature_process_fields(model):
+    return [field for field in model._meta.get_fields() if isinstance(field, SignatureProcessField)]
+
+
+def prefetch_signature_processes(queryset, *field_names, actors_queryset=None):
+    """
+    Load the processes of the given signature process fields (all of them by default) with their (annotated) actors,
+    for all instances of the queryset: one query for the instances and processes, then one per field for actors.
+    """
+    if not field_names:
+        field_names = [field.name for field in get_signature_process_fields(queryset.model)]
+    return queryset.select_related(*field_names).prefetch_related(*[
+        models.Prefetch('{}__actors'.format(name), queryset=actors_queryset) for name in field_names
+    ])
+
+
+class SignatureProcessQuerySetMixin:
+    """Queryset mixin for models having signature process fields"""
+
+    def prefetch_signature_processes(self, *field_names, actors_queryset=None):
+        return prefetch_signature_processes(self, *field_names, actors_queryset=actors_queryset)
@@ -23,12 +23,51 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
-from dal import autocomplete
+from functools import partial
+
 from django import forms
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.forms.models import ModelChoiceIterator
+from django.utils.translation import gettext_lazy as _
 
 from osis_signature.enums import SignatureState
 from osis_signature.models import Actor, EXTERNAL_PERSON_FIELDS
+from osis_signature.routers import pin_to_primary
+
+
+class PreResolvedModelChoiceField(forms.ModelChoiceField):
+    """A model choice field which can be given objects already fetched, e.g. by a formset for all its forms"""
+
+    resolved_objects = None
+
+    def to_python(self, value):
+        if self.resolved_objects is None or value in self.empty_values or isinstance(value, self.queryset.model):
+            return super().to_python(value)
+        try:
+            return self.resolved_objects[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
+class PreloadedModelChoiceIterator(ModelChoiceIterator):
+    """Choice iterator yielding objects already loaded, instead of querying the field queryset"""
+
+    def __init__(self, field, get_objects):
+        super().__init__(field)
+        self.get_objects = get_objects
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.get_objects():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.get_objects()) + (self.field.empty_label is not None)
 
 
 class EmptyPermittedForm:
@@ -37,21 +76,43 @@ class EmptyPermittedForm:
         super().__init__(*args, **kwargs)
 
 
-class ActorForm(EmptyPermittedForm, forms.ModelForm):
+def get_person_autocomplete_widget():
+    # Autocomplete widgets are only loaded when building a form, not when importing this module
+    from dal import autocomplete
+
+    return autocomplete.ModelSelect2(url="osis_signature:person-autocomplete")
+
+
+class PersonAutocompleteForm:
+    """Use an autocomplete widget for the person field, unless another widget is set in Meta.widgets"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields.get('person')
+        if field is not None and 'person' not in (self._meta.widgets or {}):
+            widget = get_person_autocomplete_widget()
+            widget.is_required = field.required
+            widget.attrs.update(field.widget_attrs(widget))
+            widget.choices = field.choices
+            field.widget = widget
+
+
+class ActorForm(EmptyPermittedForm, PersonAutocompleteForm, forms.ModelForm):
     class Meta:
         model = Actor
         fields = ['person'] + EXTERNAL_PERSON_FIELDS
-        widgets = {
-            'person': autocomplete.ModelSelect2(url="osis_signature:person-autocomplete"),
+        field_classes = {
+            'person': PreResolvedModelChoiceField,
+            'country': PreResolvedModelChoiceField,
         }
 
 
-class InternalActorForm(EmptyPermittedForm, forms.ModelForm):
+class InternalActorForm(EmptyPermittedForm, PersonAutocompleteForm, forms.ModelForm):
     class Meta:
         model = Actor
         fields = ['person']
-        widgets = {
-            'person': autocomplete.ModelSelect2(url="osis_signature:person-autocomplete"),
+        field_classes = {
+            'person': PreResolvedModelChoiceField,
         }
 
 
@@ -59,6 +120,125 @@ class ExternalActorForm(EmptyPermittedForm, forms.ModelForm):
     class Meta:
         model = Actor
         fields = EXTERNAL_PERSON_FIELDS
+        field_classes = {
+            'country': PreResolvedModelChoiceField,
+        }
+
+
+class BaseActorFormSet(forms.BaseInlineFormSet):
+    """
+    Inline formset resolving the submitted related objects of all its forms with a single query per field, and
+    sharing the choices of select fields between its forms
+    """
+
+    resolved_fields = ['person', 'country']
+    shared_choices_fields = ['country']
+    preloaded_choices_fields = ['person']
+
+    def __init__(self, *args, **kwargs):
+        self._shared_choices = {}
+        self._preloaded_objects = {}
+        if kwargs.get('queryset') is None:
+            # Forms follow the order of actors (e.g. for sequential signing)
+            kwargs['queryset'] = self.model._default_manager.order_by('order', 'pk')
+        super().__init__(*args, **kwargs)
+
+    def add_fields(self, form, index):
+        from dal.widgets import WidgetMixin
+
+        super().add_fields(form, index)
+        # Choices are lazily evaluated once for the formset instead of once per form
+        for name in self.shared_choices_fields:
+            field = form.fields.get(name)
+            if isinstance(field, forms.ModelChoiceField):
+                field.choices = partial(self.get_shared_choices, name, field.choices)
+        # Autocomplete widgets only render the selected object, load them at once for all forms
+        for name in self.preloaded_choices_fields:
+            field = form.fields.get(name)
+            if isinstance(field, forms.ModelChoiceField) and isinstance(field.widget, WidgetMixin):
+                field.widget.choices = PreloadedModelChoiceIterator(
+                    field,
+                    partial(self.get_selected_objects, form, name),
+                )
+
+    def get_shared_choices(self, name, choices):
+        if name not in self._shared_choices:
+            # Iterate rather than list() which would issue an additional count query
+            self._shared_choices[name] = [choice for choice in choices]
+        return self._shared_choices[name]
+
+    def get_selected_objects(self, form, name):
+        if name not in self._preloaded_objects:
+            forms_with_field = [form for form in self.forms if name in form.fields]
+            # Objects already known from validation or from related objects loaded with the instances
+            field = forms_with_field[0].fields[name]
+            known_objects = dict(getattr(field, 'resolved_objects', None) or {})
+            model_field = self.model._meta.get_field(name)
+            for other_form in forms_with_field:
+                if model_field.is_cached(other_form.instance) and getattr(other_form.instance, name):
+                    related = getattr(other_form.instance, name)
+                    known_objects[str(getattr(related, field.to_field_name or 'pk'))] = related
+            self._preloaded_objects[name] = self.fetch_objects(name, forms_with_field, known_objects)
+        value = form[name].value()
+        if value in form.fields[name].empty_values or str(value) not in self._preloaded_objects[name]:
+            return []
+        return [self._preloaded_objects[name][str(value)]]
+
+    def save(self, commit=True):
+        """Save actors, along with their order when the formset can be ordered"""
+        if not self.can_order:
+            return super().save(commit)
+        for order, form in enumerate(self.ordered_forms):
+            form.instance.order = order
+        saved = super().save(commit)
+        if commit:
+            # Forms whose ORDER did not change have not been saved, while their position may have
+            moved = [form.instance for form in self.ordered_forms if form.instance.pk and form.instance not in saved]
+            if moved:
+                self.model._default_manager.bulk_update(moved, ['order'])
+                pin_to_primary()
+        return saved
+
+    def full_clean(self):
+        if self.is_bound:
+            for name in self.resolved_fields:
+                self.resolve_field(name)
+        super().full_clean()
+
+    @staticmethod
+    def fetch_objects(name, forms_with_field, known_objects=None):
+        """Map the values of a model choice field in the given forms to their object, with at most one query"""
+        objects = dict(known_objects or {})
+        field = forms_with_field[0].fields[name]
+        key = field.to_field_name or 'pk'
+        model_field = field.queryset.model._meta.pk if key == 'pk' else field.queryset.model._meta.get_field(key)
+        values = set()
+        for form in forms_with_field:
+            value = form[name].value()
+            if value in field.empty_values or str(value) in objects:
+                continue
+            try:
+                values.add(model_field.to_python(value))
+            except ValidationError:
+                # Invalid values will be rejected when cleaning the form
+                continue
+        if values:
+            objects.update({
+                str(getattr(obj, key)): obj for obj in field.queryset.filter(**{'{}__in'.format(key): values})
+            })
+        return objects
+
+    def resolve_field(self, name):
+        forms_with_field = [
+            form for form in self.forms if isinstance(form.fields.get(name), PreResolvedModelChoiceField)
+        ]
+        if not forms_with_field:
+            return
+        resolved_objects = self.fetch_objects(name, forms_with_field)
+        for form in forms_with_field:
+            form.fields[name].resolved_objects = resolved_objects
+            # The relation is already checked, prevent model validation to query it again
+            form.instance._validated_relations = getattr(form.instance, '_validated_relations', set()) | {name}
 
 
 class SigningForm(forms.ModelForm):
@@ -69,13 +249,16 @@ class SigningForm(forms.ModelForm):
                 "'submitted' and the 'approved' and 'declined' values."
             )
         self.cleaned_data['approved'] = 'declined' not in self.data.get('submitted')
+        if not SignatureState[self.instance.state].can_switch_to(self.get_signed_state()):
+            raise ValidationError(_("This actor can not sign at this time"), code='invalid_state_transition')
         return self.cleaned_data
 
+    def get_signed_state(self):
+        return SignatureState.APPROVED if self.cleaned_data['approved'] else SignatureState.DECLINED
+
     def save(self, commit=True):
         # Upon saving this form, we need to add a new state to this actor depending on the button clicked
-        self.instance.switch_state(
-            SignatureState.APPROVED if self.cleaned_data['approved'] else SignatureState.DECLINED
-        )
+        self.instance.switch_state(self.get_signed_state())
         return super().save(commit)
 
 
@@ -29,7 +29,7 @@ from django.core.exceptions import ImproperlyConfigured
 from django.forms.models import _get_foreign_key
 from django.views.generic.edit import BaseCreateView
 
-from osis_signature.contrib.forms import ActorForm
+from osis_signature.contrib.forms import ActorForm, BaseActorFormSet
 from osis_signature.models import Process, Actor
 
 
@@ -38,6 +38,8 @@ class ActorFormsetMixin:
     actors_formset_context_object_name = 'actors_formset'
     actors_formset_factory_kwargs = {}
     actors_formset_prefix = 'actors'
+    # Let users order actors, the order being saved on actors (e.g. for sequential signing)
+    actors_formset_can_order = False
 
     def get_context_data(self, **kwargs):
         """Add formset to context data (if not already set by validation)"""
@@ -59,8 +61,9 @@ class ActorFormsetMixin:
         """Get the formset class for actors"""
         factory_kwargs = {
             'form': ActorForm,
+            'formset': BaseActorFormSet,
             'validate_min': True,
-            # 'can_order': True,
+            'can_order': self.actors_formset_can_order,
             'extra': 0,
             'min_num': 1,
             'model': Actor,
@@ -27,8 +27,12 @@ from dal import autocomplete
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 from base.models.person import Person
+from osis_signature.routers import get_read_database
 
 
 class UCLMemberAutocomplete(LoginRequiredMixin, autocomplete.Select2QuerySetView):
     raise_exception = True
     queryset = Person.objects.all().order_by('last_name', 'first_name')
+
+    def get_queryset(self):
+        return super().get_queryset().using(get_read_database(self.request))
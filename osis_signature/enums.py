@@ -32,3 +32,44 @@ class SignatureState(ChoiceEnum):
     INVITED = _("Invited to signed")
     APPROVED = _("Approved")
     DECLINED = _("Declined")
+    EXPIRED = _("Invitation expired")
+
+    def can_switch_to(self, state):
+        return state.name in ALLOWED_TRANSITIONS[self.name]
+
+    @classmethod
+    def get_previous_states(cls, state):
+        """Names of the states from which the given state can be reached"""
+        return PREVIOUS_STATES[state.name]
+
+
+class CompletionRule(ChoiceEnum):
+    ALL = _("All actors must approve")
+    QUORUM = _("A number of actors must approve")
+
+
+# Declarative transitions between states: an actor may be invited again (e.g. to resend the invitation, or after
+# having declined or let the invitation expire) and may be reset, unless they approved: approvals are final
+SIGNATURE_STATE_TRANSITIONS = {
+    SignatureState.NOT_INVITED: [SignatureState.NOT_INVITED, SignatureState.INVITED],
+    SignatureState.INVITED: [
+        SignatureState.NOT_INVITED,
+        SignatureState.INVITED,
+        SignatureState.APPROVED,
+        SignatureState.DECLINED,
+        SignatureState.EXPIRED,
+    ],
+    SignatureState.APPROVED: [],
+    SignatureState.DECLINED: [SignatureState.NOT_INVITED, SignatureState.INVITED],
+    SignatureState.EXPIRED: [SignatureState.NOT_INVITED, SignatureState.INVITED],
+}
+
+# Compiled once, by state name
+ALLOWED_TRANSITIONS = {
+    source.name: frozenset(target.name for target in targets)
+    for source, targets in SIGNATURE_STATE_TRANSITIONS.items()
+}
+PREVIOUS_STATES = {
+    target.name: sorted(source for source, targets in ALLOWED_TRANSITIONS.items() if target.name in targets)
+    for target in SignatureState
+}
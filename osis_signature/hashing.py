@@ -0,0 +1,43 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+KEY_SALT = 'osis_signature.StateHistory'
+
+
+def get_history_secret():
+    """Secret of state history hashes, which can't be recomputed without it, hence can't be forged"""
+    return getattr(settings, 'OSIS_SIGNATURE_HISTORY_SECRET', settings.SECRET_KEY)
+
+
+def compute_state_hash(actor_id, sequence, state, created_at, previous_hash):
+    """Hash of a state history entry, chained to the hash of the previous entry of its actor ('' for the first one)"""
+    if timezone.is_aware(created_at):
+        created_at = created_at.astimezone(timezone.utc)
+    value = '|'.join([str(actor_id), str(sequence), state, created_at.isoformat(), previous_hash])
+    return salted_hmac(KEY_SALT, value, secret=get_history_secret(), algorithm='sha256').hexdigest()
@@ -0,0 +1,119 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import csv
+import json
+from collections import namedtuple
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from osis_signature.models import Actor, EXTERNAL_PERSON_FIELDS
+from osis_signature.routers import pin_to_primary
+from reference.models.country import Country
+
+IMPORT_BATCH_SIZE = 500
+
+RowError = namedtuple('RowError', ['line', 'messages'])
+ImportReport = namedtuple('ImportReport', ['created', 'errors'])
+
+
+def read_csv_rows(stream):
+    """Yield (line number, row) for each record of a CSV stream with a header line"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl_rows(stream):
+    """Yield (line number, row) for each non-blank line of a JSON Lines stream, row is None if malformed"""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def get_country_lookup():
+    """Map upper-cased country ISO codes to their primary key, in a single query"""
+    return {iso_code.upper(): pk for iso_code, pk in Country.objects.order_by().values_list('iso_code', 'pk')}
+
+
+def build_external_actor(row, countries):
+    """Validate a row against the external actor rules, return the (unsaved) actor and a list of error messages"""
+    if row is None:
+        return None, [_("Malformed line")]
+    data = {field: str(row.get(field) or '').strip() for field in EXTERNAL_PERSON_FIELDS}
+    country_code = data.pop('country')
+    actor = Actor(country_id=countries.get(country_code.upper()), **data)
+
+    messages = []
+    try:
+        actor.clean_fields(exclude=['process', 'person', 'country'])
+    except ValidationError as e:
+        messages += ["{}: {}".format(field, ' '.join(errors)) for field, errors in e.message_dict.items()]
+    if country_code and actor.country_id is None:
+        messages.append(_("Unknown country code: %(code)s") % {'code': country_code})
+    # Same rule as the external_xor_person constraint, without fetching the country for each row
+    if not all(data.values()) or not country_code:
+        messages.append(str(Actor.default_error_messages['actor_data_required']))
+    return actor, messages
+
+
+def import_external_actors(rows, processes, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create an external actor in each of the given processes for every valid row.
+
+    Rows are consumed lazily and saved batch by batch, only rows in error are kept in the returned report.
+    """
+    countries = get_country_lookup()
+    rows = iter(rows)
+    created = 0
+    errors = []
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        actors = []
+        for line, row in batch:
+            actor, messages = build_external_actor(row, countries)
+            if messages:
+                errors.append(RowError(line, messages))
+                continue
+            field_values = {field: getattr(actor, field) for field in EXTERNAL_PERSON_FIELDS if field != 'country'}
+            actors += [
+                Actor(process_id=process.pk, country_id=actor.country_id, **field_values)
+                for process in processes
+            ]
+        if actors:
+            with transaction.atomic():
+                created += len(Actor.objects.bulk_create(actors, batch_size=batch_size))
+            pin_to_primary()
+    return ImportReport(created, errors)
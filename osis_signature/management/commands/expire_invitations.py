@@ -0,0 +1,51 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from osis_signature.models import ACTORS_PAGE_SIZE, Actor, get_invitation_cutoff
+from osis_signature.routers import primary_pinning_scope
+
+
+class Command(BaseCommand):
+    help = "Move actors whose invitation is older than the deadline to the expired state"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Defaults to the OSIS_SIGNATURE_INVITATION_DAYS setting")
+        parser.add_argument('--batch-size', type=int, default=ACTORS_PAGE_SIZE)
+
+    @primary_pinning_scope()
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+        else:
+            cutoff = get_invitation_cutoff()
+        if cutoff is None:
+            raise CommandError("No invitation deadline, set OSIS_SIGNATURE_INVITATION_DAYS or use --days")
+        expired = Actor.objects.expire_invitations(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS("{} invitation(s) expired".format(expired)))
@@ -0,0 +1,75 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+
+from osis_signature.importers import IMPORT_BATCH_SIZE, import_external_actors, read_csv_rows, read_jsonl_rows
+from osis_signature.models import Process
+from osis_signature.routers import primary_pinning_scope
+
+READERS = {
+    'csv': read_csv_rows,
+    'jsonl': read_jsonl_rows,
+}
+
+
+class Command(BaseCommand):
+    help = "Import external actors from a CSV or JSON Lines file into one or more signature processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with header) or JSON Lines file, country given by its ISO code")
+        parser.add_argument(
+            '--process',
+            action='append',
+            dest='processes',
+            required=True,
+            help="UUID of a process to add actors to, may be repeated",
+        )
+        parser.add_argument('--format', choices=sorted(READERS), help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    @primary_pinning_scope()
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError("Unknown file format '{}', use --format".format(file_format))
+        try:
+            processes = list(Process.objects.filter(pk__in=options['processes']))
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        if len(processes) != len(set(options['processes'])):
+            raise CommandError("Some processes do not exist")
+
+        with open(options['path'], newline='', encoding='utf-8') as stream:
+            report = import_external_actors(READERS[file_format](stream), processes, options['batch_size'])
+
+        for error in report.errors:
+            self.stderr.write("Line {}: {}".format(error.line, ' '.join(error.messages)))
+        self.stdout.write(self.style.SUCCESS(
+            "{} actor(s) created, {} line(s) in error".format(report.created, len(report.errors))
+        ))
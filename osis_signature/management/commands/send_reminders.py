@@ -0,0 +1,55 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import BaseCommand, CommandError
+
+from osis_signature.reminders import REMINDER_BATCH_SIZE, send_reminders
+from osis_signature.routers import primary_pinning_scope
+
+
+class Command(BaseCommand):
+    help = "Remind actors invited for a while to sign, using the OSIS_SIGNATURE_REMINDER_SENDER callable"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Defaults to the OSIS_SIGNATURE_REMINDER_DAYS setting")
+        parser.add_argument(
+            '--max-reminders',
+            type=int,
+            help="Defaults to the OSIS_SIGNATURE_MAX_REMINDERS setting (1 if not set)",
+        )
+        parser.add_argument('--batch-size', type=int, default=REMINDER_BATCH_SIZE)
+
+    @primary_pinning_scope()
+    def handle(self, *args, **options):
+        try:
+            sent = send_reminders(
+                days=options['days'],
+                max_reminders=options['max_reminders'],
+                batch_size=options['batch_size'],
+            )
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS("{} reminder(s) sent".format(sent)))
@@ -0,0 +1,48 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.core.management import BaseCommand, CommandError
+
+from osis_signature.audit import VERIFICATION_BATCH_SIZE, verify_state_history
+from osis_signature.routers import primary_pinning_scope
+
+
+class Command(BaseCommand):
+    help = "Verify the hash chains of state histories, from the last verified entry of each actor unless --full"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Verify all entries, ignoring checkpoints")
+        parser.add_argument('--batch-size', type=int, default=VERIFICATION_BATCH_SIZE)
+
+    @primary_pinning_scope()
+    def handle(self, *args, **options):
+        verified, issues = verify_state_history(full=options['full'], batch_size=options['batch_size'])
+        for issue in issues:
+            self.stdout.write(self.style.ERROR(
+                "Actor {}, entry {}: {}".format(issue.actor_id, issue.sequence, issue.message)
+            ))
+        if issues:
+            raise CommandError("{} broken state history chain(s)".format(len(issues)))
+        self.stdout.write(self.style.SUCCESS("{} state history entries verified".format(verified)))
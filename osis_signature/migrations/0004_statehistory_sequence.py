@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+def backfill_sequences(apps, schema_editor):
+    StateHistory = apps.get_model('osis_signature', 'StateHistory')
+    entries = StateHistory.objects.order_by('actor_id', 'created_at', 'pk').only('pk', 'actor_id')
+    batch = []
+    actor_id, sequence = None, 0
+    for entry in entries.iterator():
+        if entry.actor_id != actor_id:
+            actor_id, sequence = entry.actor_id, 0
+        sequence += 1
+        entry.sequence = sequence
+        batch.append(entry)
+        if len(batch) >= 1000:
+            StateHistory.objects.bulk_update(batch, ['sequence'])
+            batch = []
+    StateHistory.objects.bulk_update(batch, ['sequence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0003_external_actor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statehistory',
+            name='sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Sequence'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_sequences, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='statehistory',
+            options={'ordering': ('actor', 'sequence'), 'verbose_name': 'State history entry', 'verbose_name_plural': 'State history entries'},
+        ),
+        migrations.AddConstraint(
+            model_name='statehistory',
+            constraint=models.UniqueConstraint(fields=('actor', 'sequence'), name='unique_actor_state_sequence'),
+        ),
+    ]
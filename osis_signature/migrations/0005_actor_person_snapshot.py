@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0004_statehistory_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='person_snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Person data snapshot'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:26
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_current_state(apps, schema_editor):
+    Actor = apps.get_model('osis_signature', 'Actor')
+    StateHistory = apps.get_model('osis_signature', 'StateHistory')
+    Actor.objects.update(
+        current_state=Coalesce(
+            models.Subquery(
+                StateHistory.objects.filter(actor=models.OuterRef('pk')).order_by('-sequence').values('state')[:1]
+            ),
+            models.Value('NOT_INVITED'),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0005_actor_person_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='current_state',
+            field=models.CharField(choices=[('NOT_INVITED', 'Not yet invited'), ('INVITED', 'Invited to signed'), ('APPROVED', 'Approved'), ('DECLINED', 'Declined')], default='NOT_INVITED', editable=False, max_length=30, verbose_name='Current state'),
+        ),
+        migrations.RunPython(backfill_current_state, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(fields=['person', 'current_state'], name='actor_person_state_idx'),
+        ),
+    ]
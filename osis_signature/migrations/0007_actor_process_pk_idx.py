@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0006_actor_current_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(fields=['process', 'id'], name='actor_process_pk_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0007_actor_process_pk_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='sequential',
+            field=models.BooleanField(
+                default=False,
+                help_text='Actors sign one after the other, following their order',
+                verbose_name='Sequential signing',
+            ),
+        ),
+        migrations.AddField(
+            model_name='actor',
+            name='order',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Order'),
+        ),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(fields=['process', 'order', 'id'], name='actor_process_order_idx'),
+        ),
+    ]
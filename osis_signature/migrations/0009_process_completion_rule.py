@@ -0,0 +1,49 @@
+# Generated by Django 3.2.16 on 2026-10-19 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0008_sequential_signing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='completion_rule',
+            field=models.CharField(
+                choices=[('ALL', 'All actors must approve'), ('QUORUM', 'A number of actors must approve')],
+                default='ALL',
+                max_length=30,
+                verbose_name='Completion rule',
+            ),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='fail_on_decline',
+            field=models.BooleanField(
+                default=False,
+                help_text='The process can not be completed as soon as an actor declines',
+                verbose_name='Fail on decline',
+            ),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='required_approvals',
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text='Number of approvals completing the process, when a quorum is enough',
+                null=True,
+                verbose_name='Required approvals',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='process',
+            constraint=models.CheckConstraint(
+                check=models.Q(('completion_rule', 'QUORUM'), ('required_approvals__isnull', True), _negated=True),
+                name='quorum_required_approvals',
+            ),
+        ),
+    ]
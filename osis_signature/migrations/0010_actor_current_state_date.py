@@ -0,0 +1,57 @@
+# Generated by Django 3.2.16 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+STATE_CHOICES = [
+    ('NOT_INVITED', 'Not yet invited'),
+    ('INVITED', 'Invited to signed'),
+    ('APPROVED', 'Approved'),
+    ('DECLINED', 'Declined'),
+    ('EXPIRED', 'Invitation expired'),
+]
+
+
+def backfill_current_state_date(apps, schema_editor):
+    Actor = apps.get_model('osis_signature', 'Actor')
+    StateHistory = apps.get_model('osis_signature', 'StateHistory')
+    Actor.objects.update(
+        current_state_date=models.Subquery(
+            StateHistory.objects.filter(actor=models.OuterRef('pk')).order_by('-sequence').values('created_at')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0009_process_completion_rule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='current_state_date',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Current state date'),
+        ),
+        migrations.AlterField(
+            model_name='actor',
+            name='current_state',
+            field=models.CharField(
+                choices=STATE_CHOICES,
+                default='NOT_INVITED',
+                editable=False,
+                max_length=30,
+                verbose_name='Current state',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='statehistory',
+            name='state',
+            field=models.CharField(choices=STATE_CHOICES, max_length=30, verbose_name='State'),
+        ),
+        migrations.RunPython(backfill_current_state_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(fields=['current_state', 'current_state_date'], name='actor_state_date_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+def backfill_notified_at(apps, schema_editor):
+    Actor = apps.get_model('osis_signature', 'Actor')
+    Actor.objects.filter(current_state='INVITED').update(notified_at=models.F('current_state_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0010_actor_current_state_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='notified_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Last notification date'),
+        ),
+        migrations.AddField(
+            model_name='actor',
+            name='reminder_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Reminder count'),
+        ),
+        migrations.RunPython(backfill_notified_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='actor',
+            index=models.Index(fields=['current_state', 'notified_at'], name='actor_state_notified_idx'),
+        ),
+    ]
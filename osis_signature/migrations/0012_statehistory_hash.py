@@ -0,0 +1,73 @@
+# Generated by Django 3.2.16 on 2026-10-19 16:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from osis_signature.hashing import compute_state_hash
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_hashes(apps, schema_editor):
+    StateHistory = apps.get_model('osis_signature', 'StateHistory')
+    entries = []
+    actor_id, previous_hash = None, ''
+    for entry in StateHistory.objects.order_by('actor', 'sequence').only(
+        'actor', 'sequence', 'state', 'created_at'
+    ).iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        if entry.actor_id != actor_id:
+            actor_id, previous_hash = entry.actor_id, ''
+        entry.hash = previous_hash = compute_state_hash(
+            entry.actor_id, entry.sequence, entry.state, entry.created_at, previous_hash
+        )
+        entries.append(entry)
+        if len(entries) == BACKFILL_BATCH_SIZE:
+            StateHistory.objects.bulk_update(entries, ['hash'])
+            entries = []
+    StateHistory.objects.bulk_update(entries, ['hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_signature', '0011_actor_reminders'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='statehistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Date'),
+        ),
+        migrations.AddField(
+            model_name='statehistory',
+            name='hash',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='Hash'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_hashes, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='StateHistoryCheckpoint',
+            fields=[
+                (
+                    'actor',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='history_checkpoint',
+                        serialize=False,
+                        to='osis_signature.actor',
+                        verbose_name='Actor',
+                    ),
+                ),
+                ('sequence', models.PositiveIntegerField(verbose_name='Sequence')),
+                ('hash', models.CharField(max_length=64, verbose_name='Hash')),
+                ('verified_at', models.DateTimeField(verbose_name='Verification date')),
+            ],
+            options={
+                'verbose_name': 'State history checkpoint',
+                'verbose_name_plural': 'State history checkpoints',
+            },
+        ),
+    ]
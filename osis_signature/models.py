@@ -25,15 +25,23 @@
 # ##############################################################################
 import operator
 import uuid
+from collections import defaultdict, namedtuple
+from contextlib import nullcontext
+from datetime import timedelta
 from functools import reduce
+from itertools import islice
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
 from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from osis_signature.enums import SignatureState
+from osis_signature.enums import CompletionRule, SignatureState
+from osis_signature.hashing import compute_state_hash
+from osis_signature.routers import get_read_database, pin_to_primary
+from osis_signature.signals import record_transition
 
 NOT_MAPPED = ''
 PERSON_FIELD_MAPPING = {
@@ -48,43 +56,450 @@ PERSON_FIELD_MAPPING = {
 EXTERNAL_PERSON_FIELDS = list(PERSON_FIELD_MAPPING.keys())
 TEXT_FIELDS = sorted(set(EXTERNAL_PERSON_FIELDS) - {'country'})
 
+# Actor fields loaded by listing profiles (see ActorQuerySet.listing), person fields are loaded from their mapping
+TABLE_LISTING_FIELDS = ['first_name', 'last_name', 'email']
+NOTIFICATION_LISTING_FIELDS = TABLE_LISTING_FIELDS + ['uuid', 'language']
+ACTOR_LISTING_PROFILES = {
+    'table': TABLE_LISTING_FIELDS,
+    'notification': NOTIFICATION_LISTING_FIELDS,
+    'signing': NOTIFICATION_LISTING_FIELDS + ['comment'],
+    'status': TABLE_LISTING_FIELDS + ['uuid', 'current_state', 'current_state_date'],
+    'full': None,
+}
+ACTORS_PAGE_SIZE = 500
+KeysetPage = namedtuple('KeysetPage', ['objects', 'previous_key', 'next_key'])
+
+# States in which person data of actors is frozen, when enabled
+PERSON_SNAPSHOT_STATES = [SignatureState.INVITED.name, SignatureState.APPROVED.name, SignatureState.DECLINED.name]
+
+# Number of attempts to record a state when concurrent writers compete for the same sequence
+STATE_SEQUENCE_ATTEMPTS = 3
+
+# Actor fields only written along the state history (or by reminders), left out of ordinary saves
+STATE_TRACKING_FIELDS = ['current_state', 'current_state_date', 'notified_at', 'reminder_count']
+
+
+class InvalidStateTransition(ValueError):
+    def __init__(self, previous_state, state):
+        super().__init__("Can't switch state from {} to {}".format(previous_state, state))
+        self.previous_state = previous_state
+        self.state = state
+
+
+class ProcessQuerySet(models.QuerySet):
+    def clone(self, to_count=1, copy_states=False):
+        """Clone each process of the queryset, return the list of new processes by source process primary key"""
+        return clone_processes(list(self), to_count, copy_states)
+
+    def invite_next_signers(self):
+        """Invite the next signer of each sequential process of the queryset, return the created state entries"""
+        return invite_next_signers(self)
+
+    def complete(self):
+        """Processes whose completion rule is met, counting states of actors in a single aggregation"""
+        return self.annotate(
+            actors_count=models.Count('actors'),
+            approved_count=models.Count('actors', filter=models.Q(actors__current_state=SignatureState.APPROVED.name)),
+            declined_count=models.Count('actors', filter=models.Q(actors__current_state=SignatureState.DECLINED.name)),
+        ).filter(
+            models.Q(completion_rule=CompletionRule.ALL.name, approved_count=models.F('actors_count'))
+            | (
+                models.Q(completion_rule=CompletionRule.QUORUM.name, approved_count__gte=models.F('required_approvals'))
+                & (models.Q(fail_on_decline=False) | models.Q(declined_count=0))
+            )
+        )
+
 
 class Process(models.Model):
     uuid = models.UUIDField(
         default=uuid.uuid4,
         primary_key=True,
     )
+    sequential = models.BooleanField(
+        default=False,
+        verbose_name=_("Sequential signing"),
+        help_text=_("Actors sign one after the other, following their order"),
+    )
+    completion_rule = models.CharField(
+        choices=CompletionRule.choices(),
+        default=CompletionRule.ALL.name,
+        max_length=30,
+        verbose_name=_("Completion rule"),
+    )
+    required_approvals = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_("Required approvals"),
+        help_text=_("Number of approvals completing the process, when a quorum is enough"),
+    )
+    fail_on_decline = models.BooleanField(
+        default=False,
+        verbose_name=_("Fail on decline"),
+        help_text=_("The process can not be completed as soon as an actor declines"),
+    )
+
+    objects = ProcessQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Process")
         verbose_name_plural = _("Processes")
+        constraints = [
+            models.CheckConstraint(
+                check=~models.Q(completion_rule=CompletionRule.QUORUM.name, required_approvals__isnull=True),
+                name='quorum_required_approvals',
+            ),
+        ]
+
+    def clone(self, to_count=1, copy_states=False):
+        """Copy the actors of this process into `to_count` new processes, return the list of new processes"""
+        return clone_processes([self], to_count, copy_states)[self.pk]
+
+    def is_complete(self):
+        """Whether the completion rule of this process is met, with a single aggregate query"""
+        return Process.objects.filter(pk=self.pk).complete().exists()
+
+    def get_next_signer(self):
+        """The first actor (by order) not having approved yet, if they are still to be invited"""
+        actor = self.actors.exclude(current_state=SignatureState.APPROVED.name).order_by('order', 'pk').first()
+        if actor and actor.current_state == SignatureState.NOT_INVITED.name:
+            return actor
+        return None
+
+
+def invite_next_signers(processes):
+    """
+    Invite, in bulk, the next signer of each of the given sequential processes: the first actor (by order) not having
+    approved yet, if not invited yet.
+    """
+    first_pending = (
+        Actor.objects.filter(process=models.OuterRef('process'))
+        .exclude(current_state=SignatureState.APPROVED.name)
+        .order_by('order', 'pk')
+        .values('pk')[:1]
+    )
+    return Actor.objects.filter(
+        process__in=processes,
+        process__sequential=True,
+        current_state=SignatureState.NOT_INVITED.name,
+        pk=models.Subquery(first_pending),
+    ).switch_state(SignatureState.INVITED)
+
+
+def clone_processes(processes, to_count, copy_states):
+    """
+    Copy actors (internal and external) of the given processes into `to_count` new processes each, with a fixed number
+    of queries whatever the number of actors. States (along with signing comments and snapshots of person data taken
+    when invited or signing) are reset unless `copy_states` is set.
+    Only base actor data is copied, not the one of Actor subclasses.
+    """
+    excluded_fields = {'id', 'uuid', 'process'} | (
+        set() if copy_states else {'comment', 'person_snapshot', *STATE_TRACKING_FIELDS}
+    )
+    actor_fields = [field.attname for field in Actor._meta.concrete_fields if field.name not in excluded_fields]
+    source_actors = models.QuerySet(Actor).filter(process__in=processes).order_by('pk').values(
+        'pk', 'process_id', *actor_fields
+    )
+    # Settings of processes (e.g. completion rule) are copied as well
+    process_values = {
+        process.pk: {
+            field.attname: getattr(process, field.attname)
+            for field in Process._meta.concrete_fields
+            if not field.primary_key
+        }
+        for process in processes
+    }
+    with transaction.atomic():
+        clones = {
+            process.pk: [Process(**process_values[process.pk]) for clone_index in range(to_count)]
+            for process in processes
+        }
+        Process.objects.bulk_create([clone for process_clones in clones.values() for clone in process_clones])
+        # Bulk inserts send no post_save signal
+        pin_to_primary()
+
+        # Copied states are dated at cloning time, the date of their copied entries
+        cloned_at = timezone.now()
+        new_actors = []
+        for values in source_actors:
+            source_pk = values.pop('pk')
+            if copy_states and values['current_state_date'] is not None:
+                values.update(
+                    current_state_date=cloned_at,
+                    notified_at=cloned_at if values['current_state'] == SignatureState.INVITED.name else None,
+                    reminder_count=0,
+                )
+            for clone in clones[values.pop('process_id')]:
+                actor = Actor(process=clone, **values)
+                # Person data must not be proxied into external data when inserting
+                actor._disable_proxy = True
+                new_actors.append((source_pk, actor))
+        actors = [actor for source_pk, actor in new_actors]
+        Actor.objects.bulk_create(actors)
+        for actor in actors:
+            delattr(actor, '_disable_proxy')
+
+        if copy_states and actors:
+            if actors[0].pk is None:
+                # Primary keys are not returned by bulk inserts on this database
+                pks = dict(
+                    models.QuerySet(Actor)
+                    .filter(uuid__in=[actor.uuid for actor in actors])
+                    .values_list('uuid', 'pk')
+                )
+                for actor in actors:
+                    actor.pk = pks[actor.uuid]
+            source_states = defaultdict(list)
+            for state in StateHistory.objects.filter(actor__in={source_pk for source_pk, actor in new_actors}).order_by(
+                'actor', 'sequence'
+            ).values('actor_id', 'state', 'sequence'):
+                source_states[state['actor_id']].append(state)
+            # Copied entries keep their state and sequence, but are dated at cloning time and chained to their actor
+            entries = []
+            for source_pk, actor in new_actors:
+                previous_hash = ''
+                for state in source_states[source_pk]:
+                    entry = StateHistory(
+                        actor=actor,
+                        state=state['state'],
+                        sequence=state['sequence'],
+                        created_at=cloned_at,
+                    )
+                    previous_hash = entry.compute_hash(previous_hash)
+                    entries.append(entry)
+            StateHistory.objects.bulk_create(entries)
+    return clones
+
+
+def is_person_snapshot_enabled():
+    return getattr(settings, 'OSIS_SIGNATURE_PERSON_SNAPSHOT', False)
+
+
+def get_invitation_cutoff():
+    """Invitations sent before this date are expired, None when invitations never expire"""
+    days = getattr(settings, 'OSIS_SIGNATURE_INVITATION_DAYS', None)
+    if days is None:
+        return None
+    return timezone.now() - timedelta(days=days)
+
+
+class PersonSnapshotIterable(models.query.ModelIterable):
+    """Yield actors loaded without their person, fetching by chunk only the persons of actors without snapshot"""
+
+    def __iter__(self):
+        actors = super().__iter__()
+        while True:
+            chunk = list(islice(actors, self.chunk_size))
+            if not chunk:
+                break
+            models.prefetch_related_objects(
+                [actor for actor in chunk if actor.person_id and not actor.has_person_snapshot],
+                'person',
+            )
+            yield from chunk
+
+
+class ActorQuerySet(models.QuerySet):
+    def pending_for(self, person):
+        """Actors of a person invited to sign, across all processes"""
+        return self.filter(person=person, current_state=SignatureState.INVITED.name).select_related('process')
+
+    def switch_state(self, state: SignatureState):
+        """
+        Switch the state of the actors allowed to move to the given state, others being filtered out in SQL.
+        Return the created state entries.
+        """
+        db = router.db_for_write(self.model)
+        with transaction.atomic(using=db):
+            queryset = self.using(db).filter(current_state__in=SignatureState.get_previous_states(state))
+            if state == SignatureState.APPROVED:
+                # Following signers are only invited for sequential processes
+                queryset = queryset.annotate(process_sequential=models.F('process__sequential'))
+            actors = list(queryset.select_for_update(of=('self',)).order_by('pk'))
+            if not actors:
+                return []
+            for attempt in range(STATE_SEQUENCE_ATTEMPTS):
+                entries = self._build_state_entries(actors, state, db)
+                try:
+                    with transaction.atomic(using=db):
+                        entries = StateHistory.objects.using(db).bulk_create(entries)
+                    break
+                except IntegrityError:
+                    # A single actor switched concurrently took a sequence number, try again with the next ones
+                    if attempt == STATE_SEQUENCE_ATTEMPTS - 1:
+                        raise
+            # Bulk writes send no post_save signal
+            pin_to_primary()
+            if entries[0].pk is None:
+                pks = dict(
+                    StateHistory.objects.using(db)
+                    .filter(reduce(operator.or_, [
+                        models.Q(actor=entry.actor_id, sequence=entry.sequence) for entry in entries
+                    ]))
+                    .values_list('actor', 'pk')
+                )
+                for entry in entries:
+                    entry.pk = pks[entry.actor_id]
+            state_date = models.Subquery(
+                StateHistory.objects.filter(actor=models.OuterRef('pk')).order_by('-sequence').values('created_at')[:1]
+            )
+            Actor.objects.using(db).filter(pk__in=[actor.pk for actor in actors]).update(
+                current_state=state.name,
+                current_state_date=state_date,
+                # Reminders start over from the invitation
+                notified_at=state_date if state == SignatureState.INVITED else None,
+                reminder_count=0,
+            )
+            previous_states = [actor.current_state for actor in actors]
+            snapshot_actors = []
+            for actor, entry in zip(actors, entries):
+                actor.current_state = state.name
+                actor.current_state_date = entry.created_at
+                actor.notified_at = entry.created_at if state == SignatureState.INVITED else None
+                actor.reminder_count = 0
+                if hasattr(actor, 'last_state'):
+                    actor.last_state = entry.state
+                    actor.last_state_date = entry.created_at
+                    actor.last_sequence = entry.sequence
+                if actor.person_id and state.name in PERSON_SNAPSHOT_STATES and is_person_snapshot_enabled():
+                    actor.person_snapshot = actor.build_person_snapshot()
+                    snapshot_actors.append(actor)
+            if snapshot_actors:
+                Actor.objects.using(db).bulk_update(snapshot_actors, ['person_snapshot'])
+            transitions = list(zip(actors, previous_states, entries))
+            sequential_processes = {actor.process_id for actor in actors if getattr(actor, 'process_sequential', False)}
+            if sequential_processes:
+                # Sequential signing: invite the following actor of each process, along with the approval
+                for actor, previous_state, entry in transitions:
+                    record_transition(actor, previous_state, state.name, entry, using=db)
+                invite_next_signers(sequential_processes)
+        if not sequential_processes:
+            # Recorded once out of the savepoint, so that all transitions of a transaction share the same flush
+            for actor, previous_state, entry in transitions:
+                record_transition(actor, previous_state, state.name, entry, using=db)
+        return entries
+
+    @staticmethod
+    def _build_state_entries(actors, state, db):
+        """New entries of the given actors, following and chained to their latest ones"""
+        last_entries = {
+            actor_id: (sequence, hash)
+            for actor_id, sequence, hash in StateHistory.objects.db_manager(db)
+            .latest_by_actor()
+            .filter(actor__in=actors)
+            .values_list('actor', 'sequence', 'hash')
+        }
+        entries = []
+        for actor in actors:
+            last_sequence, last_hash = last_entries.get(actor.pk, (0, ''))
+            entry = StateHistory(actor=actor, state=state.name, sequence=last_sequence + 1)
+            entry.compute_hash(last_hash)
+            entries.append(entry)
+        return entries
+
+    def keyset_page(self, after=None, before=None, size=ACTORS_PAGE_SIZE):
+        """
+        Get a page of actors ordered by primary key, starting after (or ending before) the given key. Keys to use for
+        getting the previous and next pages are given, if any, so that no offset or count is ever needed.
+        """
+        if before is not None:
+            objects = list(self.filter(pk__lt=before).order_by('-pk')[:size + 1])
+            has_previous, has_next = len(objects) > size, True
+            objects = objects[:size][::-1]
+        else:
+            queryset = self.filter(pk__gt=after) if after is not None else self
+            objects = list(queryset.order_by('pk')[:size + 1])
+            has_previous, has_next = after is not None, len(objects) > size
+            objects = objects[:size]
+        return KeysetPage(
+            objects,
+            objects[0].pk if objects and has_previous else None,
+            objects[-1].pk if objects and has_next else None,
+        )
+
+    def keyset_iterator(self, size=ACTORS_PAGE_SIZE):
+        """Iterate over actors page by page, keeping memory bounded whatever the number of actors"""
+        page = self.keyset_page(size=size)
+        while True:
+            yield from page.objects
+            if page.next_key is None:
+                return
+            page = self.keyset_page(after=page.next_key, size=size)
 
+    def listing(self, profile):
+        """Only load the columns needed by a listing profile (see ACTOR_LISTING_PROFILES)"""
+        fields = ACTOR_LISTING_PROFILES[profile]
+        if fields is None:
+            return self
+        # Needed to know where data must be read from, and to link actors to their process
+        columns = ['process', 'person', 'person_snapshot'] + fields
+        if isinstance(self.query.select_related, dict) and 'person' in self.query.select_related:
+            columns += [
+                'person__{}'.format(PERSON_FIELD_MAPPING[field])
+                for field in fields
+                if PERSON_FIELD_MAPPING.get(field, NOT_MAPPED) != NOT_MAPPED
+            ]
+        return self.only(*columns)
 
-class ActorManager(models.Manager):
+    def only(self, *fields):
+        # A joined person can't be deferred, this also allows loading deferred fields (see Model.refresh_from_db)
+        if isinstance(self.query.select_related, dict) and 'person' in self.query.select_related:
+            fields += ('person',)
+        return super().only(*fields)
+
+    def with_person_snapshots(self):
+        """Do not join persons, data of actors having a person snapshot is then read from the snapshot"""
+        clone = self.select_related(None)
+        clone._iterable_class = PersonSnapshotIterable
+        return clone
+
+
+class ActorManager(models.Manager.from_queryset(ActorQuerySet)):
     def get_queryset(self):
+        # Latest entries are found by probing the (actor, sequence) unique index backwards
+        latest_states = StateHistory.objects.filter(actor=models.OuterRef('pk')).order_by('-sequence')
         return (
             super()
             .get_queryset()
             .select_related('person')
             .annotate(
                 last_state=Coalesce(
-                    models.Subquery(
-                        StateHistory.objects.filter(actor=models.OuterRef('pk'))
-                        .order_by('-created_at')
-                        .values('state')[:1]
-                    ),
+                    models.Subquery(latest_states.values('state')[:1]),
                     models.Value(SignatureState.NOT_INVITED.name),
                 ),
-                last_state_date=models.Subquery(
-                    StateHistory.objects.filter(actor=models.OuterRef('pk'))
-                    .order_by('-created_at')
-                    .values('created_at')[:1]
-                ),
+                last_state_date=models.Subquery(latest_states.values('created_at')[:1]),
+                last_sequence=models.Subquery(latest_states.values('sequence')[:1]),
             )
         )
 
+    def pending_count_for(self, person):
+        """Count of actors of a person invited to sign, only using the (person, current state) index"""
+        return super().get_queryset().filter(person=person, current_state=SignatureState.INVITED.name).count()
+
+    def expire_invitations(self, cutoff=None, batch_size=ACTORS_PAGE_SIZE):
+        """
+        Move actors invited before the cutoff (see OSIS_SIGNATURE_INVITATION_DAYS) to the EXPIRED state, in chunks of
+        `batch_size` actors each committed on their own. Return the number of expired actors.
+        """
+        cutoff = cutoff or get_invitation_cutoff()
+        if cutoff is None:
+            return 0
+        # Only using the (current state, state date) index
+        pending = super().get_queryset().filter(
+            current_state=SignatureState.INVITED.name,
+            current_state_date__lt=cutoff,
+        ).order_by('current_state_date')
+        expired = 0
+        while True:
+            pks = list(pending.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return expired
+            expired += len(self.filter(pk__in=pks).switch_state(SignatureState.EXPIRED))
+
     def all_signed(self):
-        return not self.get_queryset().exclude(last_state=SignatureState.APPROVED.name).exists()
+        queryset = self.get_queryset()
+        if self._db is None:
+            queryset = queryset.using(get_read_database())
+        return not queryset.exclude(last_state=SignatureState.APPROVED.name).exists()
 
 
 class Actor(models.Model):
@@ -162,6 +577,40 @@ class Actor(models.Model):
         verbose_name=_("Comment"),
         blank=True,
     )
+    person_snapshot = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Person data snapshot"),
+    )
+    # Denormalized from the state history, for indexed lookups (see switch_state)
+    current_state = models.CharField(
+        choices=SignatureState.choices(),
+        default=SignatureState.NOT_INVITED.name,
+        editable=False,
+        max_length=30,
+        verbose_name=_("Current state"),
+    )
+    order = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Order"),
+    )
+    current_state_date = models.DateTimeField(
+        null=True,
+        editable=False,
+        verbose_name=_("Current state date"),
+    )
+    # Reminders are tracked here rather than in the state history
+    notified_at = models.DateTimeField(
+        null=True,
+        editable=False,
+        verbose_name=_("Last notification date"),
+    )
+    reminder_count = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Reminder count"),
+    )
 
     @property
     def is_external(self):
@@ -171,6 +620,13 @@ class Actor(models.Model):
 
     class Meta:
         verbose_name = _("Actor")
+        indexes = [
+            models.Index(fields=['person', 'current_state'], name='actor_person_state_idx'),
+            models.Index(fields=['process', 'id'], name='actor_process_pk_idx'),
+            models.Index(fields=['process', 'order', 'id'], name='actor_process_order_idx'),
+            models.Index(fields=['current_state', 'current_state_date'], name='actor_state_date_idx'),
+            models.Index(fields=['current_state', 'notified_at'], name='actor_state_notified_idx'),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=(
@@ -210,30 +666,96 @@ class Actor(models.Model):
         return "Actor ({})".format(external_fields_str.strip())
 
     def __getattribute__(self, name: str):
-        """When we have a person related, get data from person"""
+        """When we have a person related, get data from person (or from its snapshot if taken)"""
         if name in EXTERNAL_PERSON_FIELDS and self.person_id and not hasattr(self, '_disable_proxy'):
+            if self.has_person_snapshot:
+                return self.get_snapshot_value(name)
             return getattr(self.person, PERSON_FIELD_MAPPING[name], '')
         return super().__getattribute__(name)
 
+    def build_person_snapshot(self):
+        snapshot = {'person': self.person_id}
+        for field, person_field in PERSON_FIELD_MAPPING.items():
+            if person_field != NOT_MAPPED:
+                # Relations are stored by their primary key
+                snapshot[field] = getattr(self.person, self.person._meta.get_field(person_field).attname)
+        return snapshot
+
+    def take_person_snapshot(self):
+        """Copy the mapped data of the person onto the actor, freezing it and making it readable without the person"""
+        self.person_snapshot = self.build_person_snapshot()
+        self.save(update_fields=['person_snapshot'])
+
+    @property
+    def has_person_snapshot(self):
+        # A snapshot taken for another person (e.g. before the actor was edited) is ignored
+        return self.person_snapshot is not None and self.person_snapshot.get('person') == self.person_id
+
+    def get_snapshot_value(self, name):
+        if PERSON_FIELD_MAPPING[name] == NOT_MAPPED:
+            return ''
+        value = self.person_snapshot.get(name)
+        field = self._meta.get_field(name)
+        if field.is_relation and value is not None:
+            if not hasattr(self, '_snapshot_relations'):
+                self._snapshot_relations = {}
+            if name not in self._snapshot_relations:
+                self._snapshot_relations[name] = field.related_model._base_manager.filter(pk=value).first()
+            return self._snapshot_relations[name]
+        return value
+
     def clean_fields(self, exclude=None):
         self._disable_proxy = True
+        # Relations already checked in bulk (e.g. by an actor formset) do not need to be queried again
+        exclude = list(exclude or []) + list(getattr(self, '_validated_relations', []))
         super().clean_fields(exclude)
         delattr(self, '_disable_proxy')
 
-    def save(self, *args, **kwargs):
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if update_fields is None and not force_insert and not self._state.adding:
+            # Do not overwrite a state switched concurrently through another instance
+            deferred_fields = self.get_deferred_fields()
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in STATE_TRACKING_FIELDS
+                and field.attname not in deferred_fields
+            ]
         self._disable_proxy = True
-        super().save(*args, **kwargs)
+        super().save(force_insert, force_update, using, update_fields)
         delattr(self, '_disable_proxy')
 
+    def get_prefetched_states(self):
+        """State entries loaded with prefetch_related('states') (or latest_states_prefetch()), None otherwise"""
+        if 'states' in getattr(self, '_prefetched_objects_cache', {}):
+            return self._prefetched_objects_cache['states']
+        return None
+
+    def get_last_state_entry(self):
+        prefetched_states = self.get_prefetched_states()
+        if prefetched_states is not None:
+            return max(prefetched_states, key=operator.attrgetter('sequence'), default=None)
+        return self.states.order_by('sequence').last()
+
     @property
     def state(self):
         if hasattr(self, 'last_state'):
             return self.last_state
-        last_state = self.states.last()
+        last_state = self.get_last_state_entry()
         if last_state:
             return last_state.state
         return SignatureState.NOT_INVITED.name
 
+    @property
+    def is_invitation_expired(self):
+        """Whether the actor has been invited before the deadline, from the annotated state when available"""
+        cutoff = get_invitation_cutoff()
+        if cutoff is None or self.state != SignatureState.INVITED.name:
+            return False
+        state_date = self.last_state_date if hasattr(self, 'last_state_date') else self.current_state_date
+        return state_date is not None and state_date < cutoff
+
     def get_state_display(self):
         return SignatureState.get_value(self.state)
 
@@ -250,7 +772,70 @@ class Actor(models.Model):
             raise ValidationError(self.default_error_messages['actor_data_required'], code='actor_data_required')
 
     def switch_state(self, state: SignatureState):
-        StateHistory.objects.create(actor=self, state=state.name)
+        # Validated against the annotated state, without querying
+        previous_state = self.state
+        if not SignatureState[previous_state].can_switch_to(state):
+            raise InvalidStateTransition(previous_state, state.name)
+        # Sequential signing: the following actor is invited along with the approval (not even looked for when the
+        # process is known not sequential)
+        invites_next_signer = state == SignatureState.APPROVED and (
+            not Actor.process.is_cached(self) or self.process.sequential
+        )
+        with transaction.atomic() if invites_next_signer else nullcontext():
+            for attempt in range(STATE_SEQUENCE_ATTEMPTS):
+                try:
+                    with transaction.atomic():
+                        entry = StateHistory.objects.create(actor=self, state=state.name)
+                        # Guard against a concurrent change of state since this actor was loaded
+                        if not Actor.objects.filter(
+                            pk=self.pk,
+                            current_state__in=SignatureState.get_previous_states(state),
+                        ).update(
+                            current_state=entry.state,
+                            current_state_date=entry.created_at,
+                            # Reminders start over from the invitation
+                            notified_at=entry.created_at if state == SignatureState.INVITED else None,
+                            reminder_count=0,
+                        ):
+                            raise InvalidStateTransition(previous_state, state.name)
+                    break
+                except IntegrityError:
+                    # Another writer took this sequence number, try again with the next one
+                    if attempt == STATE_SEQUENCE_ATTEMPTS - 1:
+                        raise
+            self.current_state = entry.state
+            self.current_state_date = entry.created_at
+            self.notified_at = entry.created_at if state == SignatureState.INVITED else None
+            self.reminder_count = 0
+            # Recorded out of the savepoint of the state change, so that all transitions of a transaction share the
+            # same flush
+            record_transition(self, previous_state, entry.state, entry, using=entry._state.db)
+            if invites_next_signer:
+                invite_next_signers([self.process_id])
+        # Opt-in: freeze person data when the actor is invited or signs
+        if self.person_id and state.name in PERSON_SNAPSHOT_STATES and is_person_snapshot_enabled():
+            self.take_person_snapshot()
+        if hasattr(self, 'last_state'):
+            # Keep annotations of this instance in sync with the recorded state
+            self.last_state = entry.state
+            self.last_state_date = entry.created_at
+            self.last_sequence = entry.sequence
+        prefetched_states = self.get_prefetched_states()
+        if prefetched_states is not None:
+            prefetched_states._result_cache.append(entry)
+        return entry
+
+
+class StateHistoryManager(models.Manager):
+    def latest_by_actor(self):
+        """Only the latest entry of each actor"""
+        return self.filter(
+            sequence=models.Subquery(
+                StateHistory.objects.filter(actor=models.OuterRef('actor'))
+                .order_by('-sequence')
+                .values('sequence')[:1]
+            )
+        )
 
 
 class StateHistory(models.Model):
@@ -266,11 +851,76 @@ class StateHistory(models.Model):
         max_length=30,
     )
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        # Set before saving, as it is hashed
+        default=timezone.now,
+        editable=False,
         verbose_name=_("Date"),
     )
+    sequence = models.PositiveIntegerField(
+        editable=False,
+        verbose_name=_("Sequence"),
+    )
+    hash = models.CharField(
+        max_length=64,
+        editable=False,
+        verbose_name=_("Hash"),
+    )
+
+    objects = StateHistoryManager()
 
     class Meta:
         verbose_name = _("State history entry")
         verbose_name_plural = _("State history entries")
-        ordering = ('created_at',)
+        ordering = ('actor', 'sequence')
+        constraints = [
+            models.UniqueConstraint(fields=['actor', 'sequence'], name='unique_actor_state_sequence'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.sequence is None or not self.hash:
+            # Sequence and previous hash must be read from the database being written to
+            using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+            previous_entries = StateHistory.objects.db_manager(using).filter(actor_id=self.actor_id)
+            if self.sequence is not None:
+                previous_entries = previous_entries.filter(sequence__lt=self.sequence)
+            previous = previous_entries.order_by('-sequence').values_list('sequence', 'hash').first()
+            if self.sequence is None:
+                self.sequence = previous[0] + 1 if previous else 1
+            self.compute_hash(previous[1] if previous else '')
+        super().save(*args, **kwargs)
+
+    def compute_hash(self, previous_hash):
+        """Chain this entry to the hash of the previous entry of its actor"""
+        self.hash = compute_state_hash(self.actor_id, self.sequence, self.state, self.created_at, previous_hash)
+        return self.hash
+
+
+class StateHistoryCheckpoint(models.Model):
+    """Last entry of the state history of an actor whose hash chain has been verified"""
+
+    actor = models.OneToOneField(
+        'osis_signature.Actor',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_("Actor"),
+        related_name='history_checkpoint',
+    )
+    sequence = models.PositiveIntegerField(
+        verbose_name=_("Sequence"),
+    )
+    hash = models.CharField(
+        max_length=64,
+        verbose_name=_("Hash"),
+    )
+    verified_at = models.DateTimeField(
+        verbose_name=_("Verification date"),
+    )
+
+    class Meta:
+        verbose_name = _("State history checkpoint")
+        verbose_name_plural = _("State history checkpoints")
+
+
+def latest_states_prefetch():
+    """Prefetch only the latest state entry of actors, e.g. actors.prefetch_related(latest_states_prefetch())"""
+    return models.Prefetch('states', queryset=StateHistory.objects.latest_by_actor())
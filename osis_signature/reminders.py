@@ -0,0 +1,98 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor
+from osis_signature.routers import pin_to_primary
+
+REMINDER_BATCH_SIZE = 100
+
+
+def get_reminder_sender():
+    """The callable sending reminders to a list of actors, set by its dotted path in OSIS_SIGNATURE_REMINDER_SENDER"""
+    path = getattr(settings, 'OSIS_SIGNATURE_REMINDER_SENDER', None)
+    if not path:
+        raise ImproperlyConfigured("Set OSIS_SIGNATURE_REMINDER_SENDER to send reminders")
+    return import_string(path)
+
+
+def get_due_reminders(days, max_reminders, now=None, queryset=None):
+    """Actors invited, and not notified since `days`, having had less than `max_reminders` reminders"""
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    # Only using the (current state, last notification date) index, without any annotation by default
+    queryset = models.QuerySet(Actor) if queryset is None else queryset
+    return queryset.filter(
+        current_state=SignatureState.INVITED.name,
+        notified_at__lt=cutoff,
+        reminder_count__lt=max_reminders,
+    )
+
+
+def send_reminders(sender=None, days=None, max_reminders=None, batch_size=REMINDER_BATCH_SIZE):
+    """
+    Hand actors due for a reminder to the sender, by batches, and return the number of reminded actors.
+
+    Due actors are found with a single query, then each batch is locked (skipping actors locked by another run, e.g.
+    from another host), sent and counted in its own transaction: a batch whose sending fails is retried on next run.
+    """
+    sender = sender or get_reminder_sender()
+    days = days if days is not None else getattr(settings, 'OSIS_SIGNATURE_REMINDER_DAYS', None)
+    if days is None:
+        raise ImproperlyConfigured("Set OSIS_SIGNATURE_REMINDER_DAYS to send reminders")
+    if max_reminders is None:
+        max_reminders = getattr(settings, 'OSIS_SIGNATURE_MAX_REMINDERS', 1)
+    now = timezone.now()
+    pks = list(get_due_reminders(days, max_reminders, now).order_by('notified_at').values_list('pk', flat=True))
+    sent = 0
+    for start in range(0, len(pks), batch_size):
+        with transaction.atomic():
+            actors = list(
+                # Still due, as another run may have sent reminders in the meantime
+                get_due_reminders(days, max_reminders, now, Actor.objects.filter(pk__in=pks[start:start + batch_size]))
+                .listing('notification')
+                .select_for_update(
+                    skip_locked=connection.features.has_select_for_update_skip_locked,
+                    of=('self',),
+                )
+                .order_by('pk')
+            )
+            if not actors:
+                continue
+            sender(actors)
+            models.QuerySet(Actor).filter(pk__in=[actor.pk for actor in actors]).update(
+                notified_at=now,
+                reminder_count=models.F('reminder_count') + 1,
+            )
+            pin_to_primary()
+            sent += len(actors)
+    return sent
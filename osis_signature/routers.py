@@ -0,0 +1,127 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_primary_pinned = contextvars.ContextVar('osis_signature_primary_pinned', default=False)
+
+
+def get_replica_database():
+    """Return the alias of the configured read replica, if any"""
+    return getattr(settings, 'OSIS_SIGNATURE_READ_DATABASE', None)
+
+
+def pin_to_primary():
+    """Send all subsequent signature reads of the current request/context to the primary database"""
+    _primary_pinned.set(True)
+
+
+def is_pinned_to_primary():
+    return _primary_pinned.get()
+
+
+@contextmanager
+def primary_pinning_scope():
+    """
+    Undo pinning to the primary made within this block when it exits, for code run outside of requests, where nothing
+    else would reset it. Also usable as a decorator, e.g. on the `handle()` method of commands writing signature data,
+    so that reads of the calling code (e.g. a task running several commands) are not left pinned after them.
+    """
+    token = _primary_pinned.set(False)
+    try:
+        yield
+    finally:
+        _primary_pinned.reset(token)
+
+
+def get_read_database(request=None):
+    """
+    Return the database alias to use for read-only signature queries, suitable for `QuerySet.using()`.
+
+    None is returned when no replica is configured, letting the usual routing apply.
+    """
+    replica = get_replica_database()
+    if replica and (is_pinned_to_primary() or (request is not None and request.method not in SAFE_METHODS)):
+        return DEFAULT_DB_ALIAS
+    return replica
+
+
+def is_signature_model(model):
+    from osis_signature.models import Actor, Process, StateHistory
+
+    return model._meta.app_label == 'osis_signature' or issubclass(model, (Actor, Process, StateHistory))
+
+
+class SignatureReadReplicaRouter:
+    """
+    Route reads of signature models to the replica configured in `OSIS_SIGNATURE_READ_DATABASE`, and all writes
+    to the primary database. Once a signature model has been written in the current request, reads go to the
+    primary so that the changes are visible right away.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = get_replica_database()
+        if replica and is_signature_model(model):
+            return DEFAULT_DB_ALIAS if is_pinned_to_primary() else replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        if get_replica_database() and is_signature_model(model):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, get_replica_database()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == get_replica_database():
+            return False
+        return None
+
+
+# Bulk writes (update(), bulk_create(), ...) send no signal, they call pin_to_primary() explicitly
+@receiver(post_save, dispatch_uid='osis_signature_pin_on_save')
+@receiver(post_delete, dispatch_uid='osis_signature_pin_on_delete')
+def pin_after_write(sender, **kwargs):
+    if is_signature_model(sender):
+        pin_to_primary()
+
+
+@receiver(request_started, dispatch_uid='osis_signature_unpin')
+@receiver(request_finished, dispatch_uid='osis_signature_unpin_on_finished')
+def unpin_on_request_started(sender, **kwargs):
+    _primary_pinned.set(False)
@@ -0,0 +1,146 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+from functools import wraps
+
+from django.db import transaction
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# Sent once the transaction recording state changes has been committed, with all transitions of this transaction:
+# state_changed.send(sender=Actor, transitions=[StateTransition, ...], using=alias)
+state_changed = Signal()
+
+StateTransition = namedtuple('StateTransition', ['actor', 'previous_state', 'state', 'entry'])
+
+_batches = threading.local()
+
+
+class TransitionBatch:
+    """Transitions recorded in the same transaction, sent together after commit"""
+
+    def __init__(self, using):
+        self.using = using
+        self.transitions = []
+        # Savepoints in which the flush callback has been registered, None until then
+        self.flush_savepoints = None
+        # Whether some transitions may have been rolled back with a savepoint, while the flush survived
+        self.needs_check = False
+        self.sent = False
+
+    def is_pending(self, connection):
+        return not self.sent and any(self.flush in callback for callback in connection.run_on_commit)
+
+    def add(self, transition, connection):
+        self.transitions.append(transition)
+        savepoints = set(connection.savepoint_ids)
+        if self.flush_savepoints is None:
+            # A single flush for the whole transaction (run right away outside of a transaction). While pending, it
+            # survives as long as the following transitions do: its savepoints still open enclose them
+            self.flush_savepoints = savepoints
+            transaction.on_commit(self.flush, using=self.using)
+        elif not savepoints <= self.flush_savepoints:
+            self.needs_check = True
+
+    def get_committed(self, transitions):
+        """Only keep transitions which have been committed, primary keys of rolled back entries may be reused"""
+        model = type(transitions[0].entry)
+        committed = set(
+            model._base_manager.using(self.using)
+            .filter(pk__in=[transition.entry.pk for transition in transitions])
+            .values_list('pk', 'actor_id', 'sequence')
+        )
+        kept = []
+        # The latest transition matching an entry is the committed one
+        for transition in reversed(transitions):
+            key = (transition.entry.pk, transition.entry.actor_id, transition.entry.sequence)
+            if key in committed:
+                committed.remove(key)
+                kept.append(transition)
+        return kept[::-1]
+
+    def flush(self):
+        if self.sent:
+            return
+        self.sent = True
+        if getattr(_batches, self.using, None) is self:
+            delattr(_batches, self.using)
+        transitions = self.transitions
+        if self.needs_check:
+            transitions = self.get_committed(transitions)
+        if not transitions:
+            return
+        for receiver, response in state_changed.send_robust(
+            sender=type(transitions[0].actor),
+            transitions=transitions,
+            using=self.using,
+        ):
+            if isinstance(response, Exception):
+                logger.error(
+                    "Error in state change receiver %r",
+                    receiver,
+                    exc_info=(type(response), response, response.__traceback__),
+                )
+
+
+def record_transition(actor, previous_state, state, entry, using):
+    """Queue a transition, to be sent with the other ones of the current transaction once it is committed"""
+    connection = transaction.get_connection(using)
+    batch = getattr(_batches, using, None)
+    if batch is None or not batch.is_pending(connection):
+        batch = TransitionBatch(using)
+        setattr(_batches, using, batch)
+    batch.add(StateTransition(actor, previous_state, state, entry), connection)
+
+
+def in_executor(executor):
+    """Run the decorated state change receiver in a concurrent.futures executor, e.g. a ThreadPoolExecutor"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return executor.submit(func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def in_event_loop(loop):
+    """Run the decorated coroutine state change receiver in a running asyncio event loop (from another thread)"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return asyncio.run_coroutine_threadsafe(func(*args, **kwargs), loop)
+
+        return wrapper
+
+    return decorator
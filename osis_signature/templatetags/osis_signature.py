@@ -24,15 +24,67 @@
 #
 # ##############################################################################
 from django import template
+from django.http import QueryDict
+
+from osis_signature.models import Actor
+from osis_signature.routers import get_read_database
 
 register = template.Library()
 
 
-@register.inclusion_tag('osis_signature/signature_table.html')
-def signature_table(process):
+@register.inclusion_tag('osis_signature/signature_table.html', takes_context=True)
+def signature_table(context, process, page_size=None, page_param='actors'):
+    """Display actors of a process, only `page_size` actors at a time (with navigation links) if given"""
     if not process:
         raise ValueError("Process is non-existent")
+    if not page_size:
+        return {
+            'process': process,
+            'actors': _get_actors(process),
+        }
+    actors = process.actors.using(get_read_database()).listing('table')
+    request = context.get('request')
+    params = request.GET.copy() if request else QueryDict(mutable=True)
+    page = actors.keyset_page(
+        after=_get_key(params, page_param + '_after'),
+        before=_get_key(params, page_param + '_before'),
+        size=page_size,
+    )
     return {
         'process': process,
-        'actors': process.actors.all(),
+        'actors': page.objects,
+        'previous_url': _get_page_url(params, page_param, 'before', page.previous_key),
+        'next_url': _get_page_url(params, page_param, 'after', page.next_key),
     }
+
+
+def _get_actors(process):
+    if 'actors' in getattr(process, '_prefetched_objects_cache', {}):
+        # Already loaded, e.g. with prefetch_signature_processes()
+        return process.actors.all()
+    return process.actors.using(get_read_database()).listing('table')
+
+
+def _get_key(params, name):
+    try:
+        return int(params[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _get_page_url(params, page_param, direction, key):
+    if key is None:
+        return None
+    params = params.copy()
+    params.pop(page_param + '_after', None)
+    params.pop(page_param + '_before', None)
+    params['{}_{}'.format(page_param, direction)] = key
+    return '?' + params.urlencode()
+
+
+@register.simple_tag
+def pending_signatures_count(person):
+    """Number of signatures the person is invited to give, e.g. for a badge"""
+    if not person:
+        return 0
+    return Actor.objects.db_manager(get_read_database()).pending_count_for(person)
@@ -0,0 +1,143 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+"""
+Query plan assertions, so that a change turning index lookups of the core querysets into full scans fails tests.
+
+Plans are read with EXPLAIN on SQLite and PostgreSQL, estimated rows being only given by PostgreSQL.
+"""
+import json
+import re
+from collections import namedtuple
+
+from django.db import connections
+
+# An access to a table, full_scan meaning every row (or index entry) of the table is read
+PlanNode = namedtuple('PlanNode', ['table', 'index', 'full_scan', 'rows'])
+
+# E.g. "SEARCH osis_signature_actor USING INDEX actor_process_order_idx (process_id=?)", "SCAN TABLE t AS U0"
+SQLITE_ACCESS = re.compile(
+    r'^(?P<method>SCAN|SEARCH)(?: TABLE)? (?P<name>\S+)(?: AS (?P<alias>\S+))?'
+    r'(?: USING (?:(?P<automatic>AUTOMATIC )?(?:COVERING |PARTIAL )*INDEX(?: (?P<index>[^\s(]+))?'
+    r'|INTEGER PRIMARY KEY))?'
+)
+# Table aliases of compiled queries, e.g. '"osis_signature_statehistory" U0'
+SQL_ALIAS = re.compile(r'"(?P<table>[^"]+)" (?P<alias>[A-Z]\d+)\b')
+POSTGRESQL_INDEX_SCANS = {'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+
+def get_query_plan(queryset):
+    """Accesses to tables of the plan of a queryset, raise NotImplementedError for unsupported databases"""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            aliases = {match['alias']: match['table'] for match in SQL_ALIAS.finditer(sql)}
+            return parse_sqlite_plan([row[-1] for row in cursor.fetchall()], aliases)
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            # Decoded by psycopg2 unless the column type is unknown
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return list(parse_postgresql_plan(plan[0]['Plan']))
+    raise NotImplementedError("Query plans of {} databases are not supported".format(connection.vendor))
+
+
+def parse_sqlite_plan(details, aliases=None):
+    nodes = []
+    for detail in details:
+        match = SQLITE_ACCESS.match(detail)
+        if not match or match['name'] == 'CONSTANT':
+            continue
+        name = match['alias'] or match['name']
+        nodes.append(PlanNode(
+            table=(aliases or {}).get(name, match['name']),
+            index=match['index'] or ('PRIMARY KEY' if 'INTEGER PRIMARY KEY' in detail else None),
+            # Automatic indexes are built from a scan of the whole table, for each execution
+            full_scan=match['method'] == 'SCAN' or bool(match['automatic']),
+            rows=None,
+        ))
+    return nodes
+
+
+def parse_postgresql_plan(node):
+    node_type = node['Node Type']
+    if node_type == 'Seq Scan':
+        yield PlanNode(node['Relation Name'], None, True, node['Plan Rows'])
+    elif node_type in POSTGRESQL_INDEX_SCANS:
+        # Index names of bitmap scans are given by their Bitmap Index Scan children
+        index = node.get('Index Name') or next(
+            (child.get('Index Name') for child in node.get('Plans', []) if child.get('Index Name')),
+            None,
+        )
+        yield PlanNode(node['Relation Name'], index, False, node['Plan Rows'])
+    for child in node.get('Plans', []):
+        if child['Node Type'] != 'Bitmap Index Scan':
+            yield from parse_postgresql_plan(child)
+
+
+class QueryPlanTestMixin:
+    """Assertions on query plans, tests being skipped on unsupported databases"""
+
+    def get_query_plan(self, queryset):
+        try:
+            return get_query_plan(queryset)
+        except NotImplementedError as e:
+            self.skipTest(str(e))
+
+    def format_plan(self, plan):
+        return '\n'.join(
+            '{} {}{}{}'.format(
+                'SCAN' if node.full_scan else 'SEARCH',
+                node.table,
+                ' USING {}'.format(node.index) if node.index else '',
+                ' (rows={})'.format(node.rows) if node.rows is not None else '',
+            )
+            for node in plan
+        )
+
+    def assertIndexScan(self, queryset, model, index=None, max_rows=None):
+        """
+        Assert that the table of the model is only read through indexes, using the given one if any and estimating at
+        most max_rows rows for each access (when estimated by the database)
+        """
+        plan = self.get_query_plan(queryset)
+        nodes = [node for node in plan if node.table == model._meta.db_table]
+        message = "in plan:\n{}".format(self.format_plan(plan))
+        self.assertTrue(nodes, "{} is not read {}".format(model._meta.db_table, message))
+        for node in nodes:
+            self.assertFalse(node.full_scan, "{} is fully scanned {}".format(node.table, message))
+            if max_rows is not None and node.rows is not None:
+                self.assertLessEqual(node.rows, max_rows, "Too many rows estimated {}".format(message))
+        if index:
+            self.assertIn(index, [node.index for node in nodes], "{} is not used {}".format(index, message))
+
+    def assertNoFullScan(self, queryset, allowed=()):
+        """Assert that no table is fully scanned, but the ones of allowed models"""
+        plan = self.get_query_plan(queryset)
+        allowed_tables = {model._meta.db_table for model in allowed}
+        scanned = [node.table for node in plan if node.full_scan and node.table not in allowed_tables]
+        self.assertFalse(scanned, "Fully scanned tables in plan:\n{}".format(self.format_plan(plan)))
@@ -0,0 +1,118 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+
+from osis_signature.audit import verify_state_history
+from osis_signature.enums import SignatureState
+from osis_signature.hashing import compute_state_hash
+from osis_signature.models import Actor, StateHistory, StateHistoryCheckpoint
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
+
+
+class StateHistoryAuditTestCase(TestCase):
+    def setUp(self):
+        self.process = ProcessFactory()
+        self.actors = ActorFactory.create_batch(3, process=self.process, external=True)
+        # Single and bulk paths
+        self.actors[0].switch_state(SignatureState.INVITED)
+        Actor.objects.filter(pk__in=[actor.pk for actor in self.actors[1:]]).switch_state(SignatureState.INVITED)
+        self.actors[0].switch_state(SignatureState.APPROVED)
+
+    def test_entries_are_chained(self):
+        first, second = StateHistory.objects.filter(actor=self.actors[0]).order_by('sequence')[:2]
+        self.assertEqual(first.hash, compute_state_hash(first.actor_id, 1, first.state, first.created_at, ''))
+        self.assertEqual(
+            second.hash,
+            compute_state_hash(second.actor_id, 2, second.state, second.created_at, first.hash),
+        )
+        # Can't be forged without the secret
+        with override_settings(OSIS_SIGNATURE_HISTORY_SECRET='other'):
+            self.assertNotEqual(
+                first.hash,
+                compute_state_hash(first.actor_id, 1, first.state, first.created_at, ''),
+            )
+
+    def test_incremental_verification(self):
+        self.assertEqual(verify_state_history(), (4, []))
+        self.assertEqual(StateHistoryCheckpoint.objects.get(actor=self.actors[0]).sequence, 2)
+        # Only new entries are hashed
+        self.assertEqual(verify_state_history(), (0, []))
+        self.actors[1].switch_state(SignatureState.DECLINED)
+        self.assertEqual(verify_state_history(batch_size=1), (1, []))
+        self.assertEqual(verify_state_history(full=True), (5, []))
+
+    def test_cloned_states_are_chained(self):
+        self.process.clone(copy_states=True)
+        verified, issues = verify_state_history()
+        self.assertEqual(issues, [])
+        self.assertEqual(verified, 8)
+
+    def test_changed_entry(self):
+        verify_state_history()
+        # Changing a verified entry is found by a full verification, or when it is the last verified one
+        StateHistory.objects.filter(actor=self.actors[0], sequence=1).update(state=SignatureState.DECLINED.name)
+        self.assertEqual(verify_state_history(), (0, []))
+        [issue] = verify_state_history(full=True).issues
+        self.assertEqual((issue.actor_id, issue.sequence), (self.actors[0].pk, 1))
+
+        # Changing a new entry, even with a recomputed but unchained hash
+        self.actors[1].switch_state(SignatureState.APPROVED)
+        entry = StateHistory.objects.get(actor=self.actors[1], sequence=2)
+        entry.state = SignatureState.DECLINED.name
+        entry.hash = compute_state_hash(entry.actor_id, entry.sequence, entry.state, entry.created_at, '')
+        entry.save()
+        [issue] = verify_state_history().issues
+        self.assertEqual((issue.actor_id, issue.sequence), (self.actors[1].pk, 2))
+        # Not verified past the broken entry
+        self.assertEqual(StateHistoryCheckpoint.objects.get(actor=self.actors[1]).sequence, 1)
+
+    def test_deleted_entries(self):
+        verify_state_history()
+        StateHistory.objects.filter(actor=self.actors[0], sequence=2).delete()
+        [issue] = verify_state_history().issues
+        self.assertEqual((issue.actor_id, issue.sequence), (self.actors[0].pk, 2))
+
+        self.actors[1].switch_state(SignatureState.APPROVED)
+        StateHistory.objects.filter(actor=self.actors[1], sequence=1).delete()
+        issues = verify_state_history().issues
+        self.assertIn(self.actors[1].pk, [issue.actor_id for issue in issues])
+
+        # Whole histories deleted after being verified
+        StateHistory.objects.filter(actor=self.actors[2]).delete()
+        for full in [False, True]:
+            issues = verify_state_history(full=full).issues
+            self.assertIn(self.actors[2].pk, [issue.actor_id for issue in issues])
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('verify_state_history', stdout=stdout)
+        self.assertIn('4 state history entries verified', stdout.getvalue())
+        StateHistory.objects.filter(actor=self.actors[2]).update(state=SignatureState.APPROVED.name)
+        with self.assertRaises(CommandError):
+            call_command('verify_state_history', '--full', stdout=StringIO())
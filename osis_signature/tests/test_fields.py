@@ -24,11 +24,14 @@
 #
 # ##############################################################################
 
+from django.db import models
+from django.template import Context, Template
 from django.test import TestCase
 
-from osis_signature.enums import SignatureState
-from osis_signature.tests.factories import ActorFactory
-from osis_signature.tests.test_signature.models import SimpleModel
+from osis_signature.contrib.fields import prefetch_signature_processes, SignatureProcessQuerySetMixin
+from osis_signature.enums import CompletionRule, SignatureState
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
+from osis_signature.tests.test_signature.models import DoubleModel, SimpleModel
 
 
 class FieldLookupTestCase(TestCase):
@@ -40,6 +43,7 @@ class FieldLookupTestCase(TestCase):
         )
         self.assertTrue(SimpleModel.objects.filter(jury__all_signed=False).exists())
 
+        actor.switch_state(SignatureState.INVITED)
         actor.switch_state(SignatureState.APPROVED)
         self.assertTrue(SimpleModel.objects.filter(jury__all_signed=True).exists())
 
@@ -54,8 +58,73 @@ class FieldLookupTestCase(TestCase):
         )
         self.assertFalse(instance.jury.actors.all_signed())
 
+        actor.switch_state(SignatureState.INVITED)
         actor.switch_state(SignatureState.APPROVED)
         self.assertTrue(instance.jury.actors.all_signed())
 
         ActorFactory(external=True, process=actor.process)
         self.assertFalse(instance.jury.actors.all_signed())
+
+    def create_process(self, states, **kwargs):
+        process = ProcessFactory(**kwargs)
+        for state in states:
+            actor = ActorFactory(process=process, external=True)
+            if state != SignatureState.NOT_INVITED:
+                actor.switch_state(SignatureState.INVITED)
+            if state not in [SignatureState.NOT_INVITED, SignatureState.INVITED]:
+                actor.switch_state(state)
+        return SimpleModel.objects.create(title=len(states), jury=process)
+
+    def test_completion_rules(self):
+        approved, declined, invited = SignatureState.APPROVED, SignatureState.DECLINED, SignatureState.INVITED
+        quorum = {'completion_rule': CompletionRule.QUORUM.name, 'required_approvals': 2}
+        complete = [
+            self.create_process([approved, approved]),
+            self.create_process([approved, approved, invited], **quorum),
+            self.create_process([approved, approved, declined], **quorum),
+        ]
+        incomplete = [
+            self.create_process([approved, invited]),
+            self.create_process([approved, declined]),
+            self.create_process([approved, invited, invited], **quorum),
+            self.create_process([approved, approved, declined], fail_on_decline=True, **quorum),
+            SimpleModel.objects.create(title="Without jury"),
+        ]
+        with self.assertNumQueries(1):
+            self.assertCountEqual(SimpleModel.objects.filter(jury__is_complete=True), complete)
+        self.assertCountEqual(SimpleModel.objects.filter(jury__is_complete=False), incomplete)
+        self.assertTrue(complete[1].jury.is_complete())
+        self.assertFalse(incomplete[2].jury.is_complete())
+
+    def test_prefetch_signature_processes(self):
+        for i in range(3):
+            jury_actor = ActorFactory(external=True)
+            jury_actor.switch_state(SignatureState.INVITED)
+            special_jury_actor = ActorFactory()
+            ActorFactory(process=special_jury_actor.process)
+            DoubleModel.objects.create(title=i, jury=jury_actor.process, special_jury=special_jury_actor.process)
+        DoubleModel.objects.create(title="Without jury")
+
+        # Instances with their processes, then actors of each field
+        with self.assertNumQueries(3):
+            instances = list(prefetch_signature_processes(DoubleModel.objects.order_by('pk')))
+        template = Template(
+            '{% load osis_signature %}'
+            '{% signature_table instance.jury %}'
+            '{% signature_table instance.special_jury %}'
+        )
+        with self.assertNumQueries(0):
+            for instance in instances[:3]:
+                self.assertEqual(instance.jury.actors.all()[0].state, SignatureState.INVITED.name)
+                self.assertEqual(len(instance.special_jury.actors.all()), 2)
+                template.render(Context({'instance': instance}))
+            self.assertIsNone(instances[3].jury)
+
+        queryset = SignatureProcessQuerySetMixinTestQuerySet(DoubleModel)
+        with self.assertNumQueries(2):
+            instance = queryset.prefetch_signature_processes('jury').first()
+            self.assertEqual(len(instance.jury.actors.all()), 1)
+
+
+class SignatureProcessQuerySetMixinTestQuerySet(SignatureProcessQuerySetMixin, models.QuerySet):
+    pass
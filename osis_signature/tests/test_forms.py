@@ -23,11 +23,17 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.forms import inlineformset_factory
 from django.test import TestCase
 
-from osis_signature.contrib.forms import CommentSigningForm
-from osis_signature.tests.factories import ActorFactory
+from base.tests.factories.person import PersonFactory
+from osis_signature.contrib.forms import ActorForm, BaseActorFormSet, CommentSigningForm
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, Process
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
+from reference.tests.factories.country import CountryFactory
 
 
 class FormsTestCase(TestCase):
@@ -37,6 +43,11 @@ class FormsTestCase(TestCase):
         with self.assertRaises(ImproperlyConfigured):
             form.is_valid()
 
+        form = CommentSigningForm({'submitted': ['approved']}, instance=actor)
+        # Not invited yet
+        self.assertFalse(form.is_valid())
+        actor.switch_state(SignatureState.INVITED)
+
         form = CommentSigningForm({'submitted': ['declined']}, instance=actor)
         self.assertTrue(form.is_valid())
         self.assertFalse(form.cleaned_data['approved'])
@@ -45,6 +56,103 @@ class FormsTestCase(TestCase):
         self.assertTrue(form.is_valid())
         self.assertTrue(form.cleaned_data['approved'])
 
-        self.assertFalse(actor.states.exists())
+        self.assertEqual(actor.states.count(), 1)
         form.save()
-        self.assertTrue(actor.states.exists())
+        self.assertEqual(actor.states.count(), 2)
+        self.assertEqual(actor.state, SignatureState.APPROVED.name)
+
+    def test_actor_formset_resolves_relations_in_bulk(self):
+        formset_class = inlineformset_factory(Process, Actor, form=ActorForm, formset=BaseActorFormSet, extra=0)
+        persons = PersonFactory.create_batch(5)
+        countries = CountryFactory.create_batch(2)
+        data = {
+            'actors-INITIAL_FORMS': 0,
+            'actors-TOTAL_FORMS': len(persons) + len(countries),
+        }
+        for i, person in enumerate(persons):
+            data['actors-{}-person'.format(i)] = person.pk
+        for i, country in enumerate(countries, start=len(persons)):
+            data.update({
+                'actors-{}-first_name'.format(i): 'John',
+                'actors-{}-last_name'.format(i): 'Doe',
+                'actors-{}-email'.format(i): 'john@example.com',
+                'actors-{}-institute'.format(i): 'Institute',
+                'actors-{}-city'.format(i): 'Somewhere',
+                'actors-{}-country'.format(i): country.pk,
+                'actors-{}-language'.format(i): settings.LANGUAGE_CODE_EN,
+            })
+        formset = formset_class(data, instance=Process(), prefix='actors')
+        # One query for persons, one for countries
+        with self.assertNumQueries(2):
+            self.assertTrue(formset.is_valid())
+        self.assertEqual(formset.forms[0].cleaned_data['person'], persons[0])
+
+        data['actors-0-person'] = 'unknown'
+        data['actors-1-person'] = -1
+        formset = formset_class(data, instance=Process(), prefix='actors')
+        self.assertFalse(formset.is_valid())
+        self.assertIn('person', formset.forms[0].errors)
+        self.assertIn('person', formset.forms[1].errors)
+
+    def test_actor_formset_shares_country_choices(self):
+        formset_class = inlineformset_factory(Process, Actor, form=ActorForm, formset=BaseActorFormSet, extra=3)
+        CountryFactory.create_batch(3)
+        formset = formset_class(instance=Process(), prefix='actors')
+        # Actors of the process, then countries only once
+        with self.assertNumQueries(2):
+            for form in formset.forms + [formset.empty_form]:
+                self.assertIn('<option', form['country'].as_widget())
+
+    def test_actor_formset_preloads_selected_persons(self):
+        formset_class = inlineformset_factory(Process, Actor, form=ActorForm, formset=BaseActorFormSet, extra=1)
+        process = Process.objects.create()
+        actors = ActorFactory.create_batch(4, process=process)
+        ActorFactory(process=process, external=True)
+
+        formset = formset_class(instance=process, prefix='actors')
+        # Only the actors (with their person) are loaded
+        with self.assertNumQueries(1):
+            rendered = [str(form['person']) for form in formset.forms]
+        for actor, widget in zip(actors, rendered):
+            self.assertIn('<option value="{}" selected>{}</option>'.format(actor.person_id, actor.person), widget)
+        # External actor and extra form
+        self.assertEqual(rendered[-2].count('<option'), 1)
+        self.assertEqual(rendered[-1].count('<option'), 1)
+
+        data = {
+            'actors-INITIAL_FORMS': 0,
+            'actors-TOTAL_FORMS': 4,
+        }
+        for i, actor in enumerate(actors):
+            data['actors-{}-person'.format(i)] = actor.person_id
+        formset = formset_class(data, instance=Process(), prefix='actors')
+        formset.is_valid()
+        with self.assertNumQueries(0):
+            rendered = [str(form['person']) for form in formset.forms]
+        self.assertIn('<option value="{}" selected>'.format(actors[3].person_id), rendered[3])
+
+    def test_actor_formset_saves_order(self):
+        formset_class = inlineformset_factory(
+            Process, Actor, form=ActorForm, formset=BaseActorFormSet, extra=0, can_order=True,
+        )
+        process = ProcessFactory()
+        actors = ActorFactory.create_batch(3, process=process)
+        data = {
+            'actors-INITIAL_FORMS': 3,
+            'actors-TOTAL_FORMS': 3,
+        }
+        for i, actor in enumerate(actors):
+            data['actors-{}-id'.format(i)] = actor.pk
+            data['actors-{}-person'.format(i)] = actor.person_id
+            data['actors-{}-ORDER'.format(i)] = i + 1
+        # Swap the first two actors, the last one is unchanged but must get its position
+        data['actors-0-ORDER'], data['actors-1-ORDER'] = 2, 1
+        formset = formset_class(data, instance=process, prefix='actors')
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        self.assertEqual(list(process.actors.order_by('order')), [actors[1], actors[0], actors[2]])
+        self.assertEqual(list(process.actors.order_by('order').values_list('order', flat=True)), [0, 1, 2])
+
+        # Forms follow the order of actors
+        formset = formset_class(instance=process, prefix='actors')
+        self.assertEqual([form.instance for form in formset.forms], [actors[1], actors[0], actors[2]])
@@ -0,0 +1,106 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from osis_signature.importers import import_external_actors, read_csv_rows, read_jsonl_rows
+from osis_signature.models import Actor
+from osis_signature.tests.factories import ProcessFactory
+from reference.tests.factories.country import CountryFactory
+
+CSV_CONTENT = """first_name,last_name,email,institute,city,country,language
+John,Doe,john@example.com,Institute,Somewhere,be,{language}
+Jane,Doe,not-an-email,Institute,Somewhere,BE,{language}
+Jack,Doe,jack@example.com,Institute,Somewhere,XX,{language}
+Jim,,jim@example.com,Institute,Somewhere,BE,{language}
+""".format(language=settings.LANGUAGE_CODE_EN)
+
+
+class ImportersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.country = CountryFactory(iso_code='BE')
+        cls.process = ProcessFactory()
+
+    def test_import_csv(self):
+        other_process = ProcessFactory()
+        # Country lookup, then one insert (within a savepoint) for the only batch having valid rows
+        with self.assertNumQueries(4):
+            report = import_external_actors(
+                read_csv_rows(StringIO(CSV_CONTENT)),
+                [self.process, other_process],
+                batch_size=2,
+            )
+        self.assertEqual(report.created, 2)
+        self.assertEqual([error.line for error in report.errors], [3, 4, 5])
+        actor = self.process.actors.get()
+        self.assertEqual(actor.email, 'john@example.com')
+        self.assertEqual(actor.country_id, self.country.pk)
+        self.assertTrue(other_process.actors.exists())
+
+    def test_import_jsonl(self):
+        row = {
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+            'institute': 'Institute',
+            'city': 'Somewhere',
+            'country': 'BE',
+            'language': settings.LANGUAGE_CODE_EN,
+        }
+        stream = StringIO('\n'.join([json.dumps(row), '', '{"broken', json.dumps({**row, 'city': ''})]))
+        report = import_external_actors(read_jsonl_rows(stream), [self.process])
+        self.assertEqual(report.created, 1)
+        self.assertEqual([error.line for error in report.errors], [3, 4])
+        self.assertEqual(Actor.objects.count(), 1)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jury.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(CSV_CONTENT)
+            stdout, stderr = StringIO(), StringIO()
+            call_command(
+                'import_external_actors',
+                path,
+                '--process',
+                str(self.process.pk),
+                stdout=stdout,
+                stderr=stderr,
+            )
+            self.assertIn('1 actor(s) created', stdout.getvalue())
+            self.assertIn('Line 5', stderr.getvalue())
+
+            with self.assertRaises(CommandError):
+                call_command('import_external_actors', path, '--process', 'not-a-uuid')
+            with self.assertRaises(CommandError):
+                call_command('import_external_actors', path, '--process', str(self.process.pk), '--format', 'xml')
@@ -0,0 +1,143 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import ast
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+import osis_signature
+
+# Modules loaded on startup, e.g. by models or URLs
+EAGER_MODULES = [
+    'osis_signature.models',
+    'osis_signature.contrib.fields',
+    'osis_signature.contrib.forms',
+    'osis_signature.urls',
+    'osis_signature.utils',
+]
+# Only loaded when rendering a form or an autocomplete view
+LAZY_MODULES = ['dal', 'osis_signature.contrib.views']
+
+# Generous budget (in seconds, including what it imports) to catch a heavy dependency being pulled in, not to benchmark
+MODELS_IMPORT_BUDGET = 0.5
+# Run in a fresh interpreter with -X importtime, which only times imports made by import statements: apps and models
+# are imported by Django with import_module() otherwise
+IMPORT_TIME_SCRIPT = """
+import django
+from django.apps import config
+
+config.import_module = lambda name: __import__(name, fromlist=['__name__'])
+django.setup()
+"""
+
+
+def get_source_path(name):
+    """Source file of an osis_signature module, None if not a module (e.g. a class imported from a module)"""
+    path = Path(osis_signature.__file__).parent.joinpath(*name.split('.')[1:])
+    for candidate in [path.with_suffix('.py'), path / '__init__.py']:
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+class ImportVisitor(ast.NodeVisitor):
+    """Names of the modules imported when executing a module, leaving out imports made inside functions"""
+
+    def __init__(self):
+        self.modules = set()
+
+    def visit_Import(self, node):
+        self.modules.update(alias.name for alias in node.names)
+
+    def visit_ImportFrom(self, node):
+        # Imported names may be submodules as well
+        self.modules.add(node.module)
+        self.modules.update('{}.{}'.format(node.module, alias.name) for alias in node.names)
+
+    def visit_FunctionDef(self, node):
+        pass
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_FunctionDef
+
+
+def get_import_graph(name):
+    """All modules imported (directly or not) when importing an osis_signature module"""
+    imported = set()
+    to_visit = [name]
+    while to_visit:
+        name = to_visit.pop()
+        # Parent packages are executed first
+        parts = name.split('.')
+        for module in ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]:
+            if module in imported:
+                continue
+            path = get_source_path(module) if module.startswith('osis_signature') else None
+            if module.startswith('osis_signature') and path is None:
+                continue
+            imported.add(module)
+            if path is not None:
+                visitor = ImportVisitor()
+                visitor.visit(ast.parse(path.read_text()))
+                to_visit.extend(visitor.modules)
+    return imported
+
+
+class ImportGraphTestCase(SimpleTestCase):
+    def test_lazy_modules(self):
+        for name in EAGER_MODULES:
+            imported = get_import_graph(name)
+            self.assertIn(name, imported)
+            for lazy_module in LAZY_MODULES:
+                self.assertFalse(
+                    [module for module in imported if module == lazy_module or module.startswith(lazy_module + '.')],
+                    "{} imports {}".format(name, lazy_module),
+                )
+
+    def test_import_graph(self):
+        imported = get_import_graph('osis_signature.models')
+        self.assertIn('osis_signature.signals', imported)
+        self.assertNotIn('osis_signature.contrib.forms', imported)
+        # Modules importing autocomplete views are found
+        self.assertIn('osis_signature.contrib.views', get_import_graph('osis_signature.contrib.views'))
+        self.assertIn('dal.autocomplete', get_import_graph('osis_signature.contrib.views'))
+
+
+class ImportCostTestCase(SimpleTestCase):
+    def test_models_import_budget(self):
+        stderr = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_TIME_SCRIPT],
+            capture_output=True,
+            check=True,
+            env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)},
+            text=True,
+        ).stderr
+        # "import time: <self us> | <cumulative us> | <module>"
+        [cumulative] = re.findall(r'^import time:\s+\d+ \|\s+(\d+) \|\s*osis_signature\.models$', stderr, re.MULTILINE)
+        self.assertLess(int(cumulative) / 1e6, MODELS_IMPORT_BUDGET)
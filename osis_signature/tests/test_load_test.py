@@ -0,0 +1,73 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, Process, StateHistory
+from osis_signature.tests.factories import ActorFactory
+from osis_signature.tests.test_signature.load_test import check_integrity, percentile, run_load_test
+
+
+class LoadTestTestCase(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+        self.assertEqual(percentile([], 95), 0)
+
+    def test_run_load_test(self):
+        reports, issues = run_load_test(actors=3, concurrency=1, submissions=2)
+        self.assertEqual(issues, [])
+        self.assertEqual([report.step for report in reports], ['invite', 'open', 'submit'])
+        self.assertEqual([report.requests for report in reports], [3, 3, 6])
+        # Second submissions of the same link are rejected
+        self.assertEqual([report.errors for report in reports], [0, 0, 3])
+        self.assertTrue(all(report.max_queries for report in reports))
+        self.assertFalse(Process.objects.exists())
+
+    def test_check_integrity(self):
+        actors = ActorFactory.create_batch(3, external=True)
+        for actor in actors:
+            actor.switch_state(SignatureState.INVITED)
+        actor_pks = [actor.pk for actor in actors]
+        self.assertEqual(check_integrity(actor_pks, set()), [])
+        Actor.objects.filter(pk=actors[0].pk).update(current_state=SignatureState.APPROVED.name)
+        StateHistory.objects.create(actor=actors[1], state=SignatureState.INVITED.name, sequence=2)
+        issues = check_integrity(actor_pks, {actors[2].pk})
+        self.assertEqual([issue.actor_pk for issue in issues], actor_pks)
+        self.assertIn("Lost update", issues[0].message)
+        self.assertIn("Duplicate state rows", issues[1].message)
+        self.assertIn("Lost update", issues[2].message)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('signature_load_test', actors=2, concurrency=1, stdout=stdout)
+        self.assertIn('submit', stdout.getvalue())
+        self.assertIn('No duplicate state rows nor lost updates', stdout.getvalue())
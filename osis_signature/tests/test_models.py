@@ -24,15 +24,29 @@
 #
 # ##############################################################################
 
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, models
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from base.tests.factories.person import PersonFactory
 from osis_signature.enums import SignatureState
-from osis_signature.models import Actor
+from osis_signature.models import (
+    Actor,
+    ActorQuerySet,
+    InvalidStateTransition,
+    Process,
+    StateHistory,
+    latest_states_prefetch,
+)
 from osis_signature.tests.factories import ActorFactory, ProcessFactory
+from osis_signature.utils import get_signing_token
 from reference.tests.factories.country import CountryFactory
 
 
@@ -95,6 +109,329 @@ class ModelsTestCase(TestCase):
         with self.assertNumQueries(0):
             self.assertEqual(first_actor.state, SignatureState.INVITED.name)
 
+    def test_actor_state_sequence(self):
+        actor = ActorFactory(external=True)
+        other_actor = ActorFactory(external=True)
+        actor.switch_state(SignatureState.INVITED)
+        other_actor.switch_state(SignatureState.INVITED)
+        actor.switch_state(SignatureState.APPROVED)
+        self.assertEqual(list(actor.states.values_list('sequence', flat=True)), [1, 2])
+        self.assertEqual(list(other_actor.states.values_list('sequence', flat=True)), [1])
+        self.assertEqual(Actor.objects.get(pk=actor.pk).last_sequence, 2)
+
+        with self.assertRaises(IntegrityError):
+            StateHistory.objects.create(actor=actor, state=SignatureState.DECLINED.name, sequence=2)
+
+    def test_state_transitions(self):
+        actor = Actor.objects.get(pk=ActorFactory(external=True).pk)
+        with self.assertNumQueries(0), self.assertRaises(InvalidStateTransition):
+            actor.switch_state(SignatureState.APPROVED)
+        self.assertTrue(SignatureState.INVITED.can_switch_to(SignatureState.DECLINED))
+        self.assertFalse(SignatureState.APPROVED.can_switch_to(SignatureState.DECLINED))
+
+        # Changed elsewhere since loaded
+        stale_actor = Actor.objects.get(pk=actor.pk)
+        actor.switch_state(SignatureState.INVITED)
+        actor.switch_state(SignatureState.APPROVED)
+        with self.assertRaises(InvalidStateTransition):
+            stale_actor.switch_state(SignatureState.INVITED)
+        self.assertEqual(actor.states.count(), 2)
+        self.assertEqual(Actor.objects.get(pk=actor.pk).current_state, SignatureState.APPROVED.name)
+
+        # Approvals are final
+        self.assertFalse(SignatureState.APPROVED.can_switch_to(SignatureState.NOT_INVITED))
+        with self.assertRaises(InvalidStateTransition):
+            actor.switch_state(SignatureState.NOT_INVITED)
+        self.assertEqual(Actor.objects.filter(pk=actor.pk).switch_state(SignatureState.NOT_INVITED), [])
+        self.assertEqual(actor.states.count(), 2)
+
+    def test_bulk_switch_state(self):
+        actors = ActorFactory.create_batch(3, process=self.process, external=True)
+        actors[0].switch_state(SignatureState.INVITED)
+        actors[0].switch_state(SignatureState.APPROVED)
+        actors[1].switch_state(SignatureState.INVITED)
+        ActorFactory(external=True)
+
+        entries = self.process.actors.switch_state(SignatureState.INVITED)
+        self.assertEqual([entry.actor for entry in entries], actors[1:])
+        self.assertEqual([entry.sequence for entry in entries], [2, 1])
+        self.assertEqual(
+            [actor.state for actor in self.process.actors.order_by('pk')],
+            [SignatureState.APPROVED.name, SignatureState.INVITED.name, SignatureState.INVITED.name],
+        )
+        self.assertEqual(
+            list(self.process.actors.order_by('pk').values_list('current_state', flat=True)),
+            [SignatureState.APPROVED.name, SignatureState.INVITED.name, SignatureState.INVITED.name],
+        )
+        self.assertTrue(all(entry.pk for entry in entries))
+        self.assertEqual(self.process.actors.filter(last_state=SignatureState.APPROVED.name).switch_state(
+            SignatureState.DECLINED
+        ), [])
+
+    def test_bulk_switch_state_retries_sequence(self):
+        actors = ActorFactory.create_batch(2, process=self.process, external=True)
+        build_state_entries = ActorQuerySet._build_state_entries
+
+        def build_state_entries_concurrently(*args):
+            entries = build_state_entries(*args)
+            if not StateHistory.objects.filter(actor=actors[0]).exists():
+                # Another writer switches the state of an actor in the meantime
+                actors[0].switch_state(SignatureState.INVITED)
+            return entries
+
+        with mock.patch.object(ActorQuerySet, '_build_state_entries', staticmethod(build_state_entries_concurrently)):
+            entries = self.process.actors.switch_state(SignatureState.INVITED)
+        self.assertEqual([entry.sequence for entry in entries], [2, 1])
+        self.assertEqual(list(actors[0].states.values_list('sequence', flat=True)), [1, 2])
+
+    def test_switch_state_updates_annotations(self):
+        actor = Actor.objects.get(pk=ActorFactory(external=True).pk)
+        entry = actor.switch_state(SignatureState.INVITED)
+        with self.assertNumQueries(0):
+            self.assertEqual(actor.state, SignatureState.INVITED.name)
+        self.assertEqual(actor.last_sequence, entry.sequence)
+
+    def test_save_keeps_switched_state(self):
+        actor = ActorFactory(external=True)
+        stale_actor = Actor.objects.get(pk=actor.pk)
+        Actor.objects.get(pk=actor.pk).switch_state(SignatureState.INVITED)
+        Actor.objects.filter(pk=actor.pk).update(reminder_count=2)
+        stale_actor.first_name = 'Jane'
+        stale_actor.save()
+        actor.refresh_from_db()
+        self.assertEqual(actor.first_name, 'Jane')
+        self.assertEqual(actor.current_state, SignatureState.INVITED.name)
+        self.assertIsNotNone(actor.current_state_date)
+        self.assertIsNotNone(actor.notified_at)
+        self.assertEqual(actor.reminder_count, 2)
+
+        # Unless explicitly asked for
+        stale_actor.save(update_fields=['current_state'])
+        actor.refresh_from_db()
+        self.assertEqual(actor.current_state, SignatureState.NOT_INVITED.name)
+
+    @override_settings(OSIS_SIGNATURE_PERSON_SNAPSHOT=True)
+    def test_person_snapshot(self):
+        actor = ActorFactory(person__first_name='John', person__country_of_citizenship=self.country)
+        actor.switch_state(SignatureState.NOT_INVITED)
+        self.assertIsNone(actor.person_snapshot)
+        actor.switch_state(SignatureState.INVITED)
+        self.assertEqual(actor.person_snapshot['first_name'], 'John')
+
+        actor.person.first_name = 'Jack'
+        actor.person.save()
+        actor_without_snapshot = ActorFactory(process=actor.process, person__first_name='Jim')
+        external_actor = ActorFactory(process=actor.process, external=True, first_name='Joe')
+
+        # Actors are loaded without persons, then the person of the only actor without snapshot is fetched
+        with self.assertNumQueries(2):
+            actors = list(actor.process.actors.with_person_snapshots().order_by('pk'))
+        with self.assertNumQueries(0):
+            self.assertEqual([a.first_name for a in actors], ['John', 'Jim', 'Joe'])
+            self.assertEqual(actors[0].institute, '')
+        with self.assertNumQueries(1):
+            self.assertEqual(actors[0].country, self.country)
+        self.assertEqual(Actor.objects.get(pk=actor.pk).first_name, 'John')
+        self.assertEqual(external_actor.first_name, 'Joe')
+
+        # The snapshot is ignored once the person changed
+        actor.person = actor_without_snapshot.person
+        self.assertEqual(actor.first_name, 'Jim')
+
+    def test_listing_profiles(self):
+        actor = ActorFactory()
+        ActorFactory(process=actor.process, external=True)
+        actors = list(Actor.objects.listing('table'))
+        self.assertIn('comment', actors[0].get_deferred_fields())
+        self.assertNotIn('email', actors[0].get_deferred_fields())
+        self.assertIn('language', actors[0].person.get_deferred_fields())
+        with self.assertNumQueries(0):
+            for listed_actor in actors:
+                self.assertTrue(listed_actor.first_name)
+                self.assertTrue(listed_actor.email)
+                self.assertEqual(listed_actor.state, SignatureState.NOT_INVITED.name)
+
+        actor = Actor.objects.listing('notification').with_person_snapshots().get(pk=actor.pk)
+        self.assertNotIn('language', actor.get_deferred_fields())
+        self.assertEqual(Actor.objects.listing('full').get(pk=actor.pk).get_deferred_fields(), set())
+
+        # Deferred fields can still be loaded
+        actor = Actor.objects.listing('table').get(pk=actor.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(actor.comment, '')
+
+    def test_sequential_signing(self):
+        process = ProcessFactory(sequential=True)
+        actors = [ActorFactory(process=process, external=True, order=order) for order in [2, 0, 1]]
+        actors = [actors[1], actors[2], actors[0]]
+        other_process = ProcessFactory()
+        other_actors = ActorFactory.create_batch(2, process=other_process, external=True)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(process.get_next_signer(), actors[0])
+        Process.objects.filter(pk__in=[process.pk, other_process.pk]).invite_next_signers()
+        self.assertIsNone(process.get_next_signer())
+        self.assertEqual(
+            [actor.state for actor in process.actors.order_by('order')],
+            [SignatureState.INVITED.name, SignatureState.NOT_INVITED.name, SignatureState.NOT_INVITED.name],
+        )
+
+        # Approving invites the following actor
+        Actor.objects.get(pk=actors[0].pk).switch_state(SignatureState.APPROVED)
+        self.assertEqual(Actor.objects.get(pk=actors[1].pk).state, SignatureState.INVITED.name)
+
+        # Also when approving in bulk
+        Actor.objects.filter(pk=actors[1].pk).switch_state(SignatureState.APPROVED)
+        self.assertEqual(Actor.objects.get(pk=actors[2].pk).state, SignatureState.INVITED.name)
+
+        # Approvals are rolled back when the following actor can't be invited
+        for approve in [
+            lambda: Actor.objects.get(pk=actors[2].pk).switch_state(SignatureState.APPROVED),
+            lambda: Actor.objects.filter(pk=actors[2].pk).switch_state(SignatureState.APPROVED),
+        ]:
+            with mock.patch('osis_signature.models.invite_next_signers', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    approve()
+            self.assertEqual(Actor.objects.get(pk=actors[2].pk).state, SignatureState.INVITED.name)
+
+        # Declining blocks the process
+        Actor.objects.get(pk=actors[2].pk).switch_state(SignatureState.DECLINED)
+        self.assertIsNone(process.get_next_signer())
+
+        # Not in non-sequential processes, without even looking for the following actor
+        other_process.actors.switch_state(SignatureState.INVITED)
+        with mock.patch('osis_signature.models.invite_next_signers') as invite_next_signers:
+            other_actors[0].switch_state(SignatureState.APPROVED)
+            Actor.objects.filter(pk=other_actors[1].pk).switch_state(SignatureState.APPROVED)
+        invite_next_signers.assert_not_called()
+        self.assertEqual(Actor.objects.get(pk=other_actors[1].pk).state, SignatureState.APPROVED.name)
+
+    def test_expire_invitations(self):
+        actors = ActorFactory.create_batch(5, process=self.process, external=True)
+        for actor in actors:
+            actor.switch_state(SignatureState.INVITED)
+        actors[4].switch_state(SignatureState.APPROVED)
+        old_actors = actors[:3] + actors[4:]
+        Actor.objects.filter(pk__in=[actor.pk for actor in old_actors]).update(
+            current_state_date=timezone.now() - timedelta(days=8),
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('expire_invitations')
+        stdout = StringIO()
+        call_command('expire_invitations', '--days=7', '--batch-size=2', stdout=stdout)
+        self.assertIn('3 invitation(s) expired', stdout.getvalue())
+        self.assertEqual(
+            [actor.state for actor in self.process.actors.order_by('pk')],
+            [SignatureState.EXPIRED.name] * 3 + [SignatureState.INVITED.name, SignatureState.APPROVED.name],
+        )
+        with override_settings(OSIS_SIGNATURE_INVITATION_DAYS=7):
+            self.assertEqual(Actor.objects.expire_invitations(), 0)
+
+        # Can be invited again
+        actor = Actor.objects.get(pk=actors[0].pk)
+        self.assertTrue(actor.current_state_date > timezone.now() - timedelta(minutes=1))
+        actor.switch_state(SignatureState.INVITED)
+        self.assertEqual(actor.state, SignatureState.INVITED.name)
+
+    def test_clone_process(self):
+        internal_actor = ActorFactory(comment='Ok')
+        process = internal_actor.process
+        external_actor = ActorFactory(process=process, external=True)
+        with self.settings(OSIS_SIGNATURE_PERSON_SNAPSHOT=True):
+            internal_actor.switch_state(SignatureState.INVITED)
+            internal_actor.switch_state(SignatureState.APPROVED)
+
+        # Source actors, processes insert and actors insert (within a savepoint)
+        with self.assertNumQueries(5):
+            clones = process.clone(to_count=3)
+        self.assertEqual(len(clones), 3)
+        for clone in clones:
+            actors = list(clone.actors.order_by('pk'))
+            self.assertEqual([actor.person_id for actor in actors], [internal_actor.person_id, None])
+            self.assertEqual(actors[1].email, external_actor.email)
+            self.assertEqual(actors[0].comment, '')
+            self.assertEqual(actors[0].state, SignatureState.NOT_INVITED.name)
+            self.assertIsNone(actors[0].person_snapshot)
+
+        clone = process.clone(copy_states=True)[0]
+        actor = clone.actors.get(person=internal_actor.person)
+        self.assertEqual(actor.comment, 'Ok')
+        self.assertEqual(actor.person_snapshot, Actor.objects.get(pk=internal_actor.pk).person_snapshot)
+        self.assertIsNotNone(actor.person_snapshot)
+        self.assertEqual(actor.state, SignatureState.APPROVED.name)
+        self.assertEqual(list(actor.states.values_list('sequence', flat=True)), [1, 2])
+
+        # Copied invitations are not expired right away, their state date being the one of their copied entries
+        invited_actor = ActorFactory(process=process, external=True)
+        invited_actor.switch_state(SignatureState.INVITED)
+        Actor.objects.filter(pk=invited_actor.pk).update(
+            current_state_date=timezone.now() - timedelta(days=8),
+            notified_at=timezone.now() - timedelta(days=8),
+        )
+        actor = process.clone(copy_states=True)[0].actors.get(email=invited_actor.email)
+        entry = actor.states.get()
+        self.assertEqual((actor.current_state_date, actor.notified_at), (entry.created_at, entry.created_at))
+        with self.settings(OSIS_SIGNATURE_INVITATION_DAYS=7):
+            Actor.objects.expire_invitations()
+        self.assertEqual(Actor.objects.get(pk=invited_actor.pk).current_state, SignatureState.EXPIRED.name)
+        self.assertEqual(Actor.objects.get(pk=actor.pk).current_state, SignatureState.INVITED.name)
+
+        other_process = ActorFactory().process
+        ActorFactory.create_batch(5, process=other_process)
+        clones = Process.objects.filter(pk__in=[process.pk, other_process.pk]).clone(to_count=2, copy_states=True)
+        self.assertEqual(clones[other_process.pk][1].actors.count(), 6)
+        self.assertEqual(len(clones[process.pk]), 2)
+
+    def test_pending_for_person(self):
+        invited_actor = ActorFactory(person=self.person)
+        invited_actor.switch_state(SignatureState.INVITED)
+        approved_actor = ActorFactory(person=self.person)
+        approved_actor.switch_state(SignatureState.INVITED)
+        approved_actor.switch_state(SignatureState.APPROVED)
+        ActorFactory(person=self.person)
+        ActorFactory().switch_state(SignatureState.INVITED)
+
+        self.assertEqual(Actor.objects.pending_count_for(self.person), 1)
+        with self.assertNumQueries(1):
+            actors = list(Actor.objects.pending_for(self.person))
+            self.assertEqual(actors, [invited_actor])
+            self.assertEqual(actors[0].process, invited_actor.process)
+            self.assertEqual(actors[0].state, SignatureState.INVITED.name)
+            self.assertIsNotNone(get_signing_token(actors[0]))
+
+    def test_keyset_iteration(self):
+        actors = ActorFactory.create_batch(5, process=self.process)
+        ActorFactory()
+        with self.assertNumQueries(3):
+            self.assertEqual(list(self.process.actors.keyset_iterator(size=2)), actors)
+        page = self.process.actors.keyset_page(after=actors[1].pk, size=2)
+        self.assertEqual(page, (actors[2:4], actors[2].pk, actors[3].pk))
+        page = self.process.actors.keyset_page(before=actors[2].pk, size=2)
+        self.assertEqual(page, (actors[:2], None, actors[1].pk))
+
+    def test_state_from_prefetched_states(self):
+        for i in range(3):
+            actor = ActorFactory(process=self.process, external=True)
+            actor.switch_state(SignatureState.INVITED)
+            actor.switch_state(SignatureState.APPROVED)
+        ActorFactory(process=self.process, external=True)
+        # Without the manager annotations
+        queryset = models.QuerySet(Actor).filter(process=self.process).order_by('pk')
+        expected_token = get_signing_token(Actor.objects.filter(process=self.process).order_by('pk').first())
+        for prefetch in ['states', latest_states_prefetch()]:
+            with self.assertNumQueries(2):
+                actors = list(queryset.prefetch_related(prefetch))
+                self.assertEqual(
+                    [actor.state for actor in actors],
+                    [SignatureState.APPROVED.name] * 3 + [SignatureState.NOT_INVITED.name],
+                )
+                self.assertEqual(actors[0].get_state_display(), SignatureState.APPROVED.value)
+                self.assertEqual(get_signing_token(actors[0]), expected_token)
+        self.assertEqual(len(actors[0].states.all()), 1)
+        actors[-1].switch_state(SignatureState.INVITED)
+        self.assertEqual(actors[-1].state, SignatureState.INVITED.name)
+
     def test_internal_actor_can_be_updated(self):
         actor = ActorFactory()
         actor.comment = 'Ok'
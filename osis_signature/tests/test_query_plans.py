@@ -0,0 +1,151 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from base.tests.factories.person import PersonFactory
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, Process, StateHistory
+from osis_signature.tests.query_plans import QueryPlanTestMixin, parse_postgresql_plan, parse_sqlite_plan
+from osis_signature.tests.test_signature.models import SimpleModel
+from reference.tests.factories.country import CountryFactory
+
+
+class QueryPlanParsingTestCase(SimpleTestCase):
+    def test_parse_sqlite_plan(self):
+        plan = parse_sqlite_plan([
+            'SCAN test_signature_simplemodel',
+            'CORRELATED SCALAR SUBQUERY 1',
+            'SEARCH U0 USING INDEX sqlite_autoindex_osis_signature_statehistory_1 (actor_id=?)',
+            'SEARCH TABLE base_person USING INTEGER PRIMARY KEY (rowid=?)',
+            'SEARCH osis_signature_actor USING AUTOMATIC COVERING INDEX (process_id=?)',
+        ], aliases={'U0': 'osis_signature_statehistory'})
+        self.assertEqual([(node.table, node.index, node.full_scan) for node in plan], [
+            ('test_signature_simplemodel', None, True),
+            ('osis_signature_statehistory', 'sqlite_autoindex_osis_signature_statehistory_1', False),
+            ('base_person', 'PRIMARY KEY', False),
+            ('osis_signature_actor', None, True),
+        ])
+
+    def test_parse_postgresql_plan(self):
+        plan = parse_postgresql_plan({
+            'Node Type': 'Nested Loop',
+            'Plans': [
+                {'Node Type': 'Seq Scan', 'Relation Name': 'test_signature_simplemodel', 'Plan Rows': 1000},
+                {
+                    'Node Type': 'Bitmap Heap Scan',
+                    'Relation Name': 'osis_signature_actor',
+                    'Plan Rows': 3,
+                    'Plans': [{'Node Type': 'Bitmap Index Scan', 'Index Name': 'actor_process_pk_idx'}],
+                },
+            ],
+        })
+        self.assertEqual(list(plan), [
+            ('test_signature_simplemodel', None, True, 1000),
+            ('osis_signature_actor', 'actor_process_pk_idx', False, 3),
+        ])
+
+
+class CoreQuerysetPlansTestCase(QueryPlanTestMixin, TestCase):
+    PROCESSES = 100
+    ACTORS_PER_PROCESS = 10
+    PERSONS = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        country = CountryFactory()
+        processes = Process.objects.bulk_create(Process() for _ in range(cls.PROCESSES))
+        SimpleModel.objects.bulk_create(SimpleModel(jury=process) for process in processes)
+        Actor.objects.bulk_create(
+            Actor(
+                process=process,
+                first_name='First name',
+                last_name='Last name {}'.format(i),
+                email='actor-{}@example.com'.format(i),
+                institute='Institute',
+                city='Somewhere',
+                country=country,
+                language='en',
+                current_state=SignatureState.INVITED.name,
+            )
+            for process in processes
+            for i in range(cls.ACTORS_PER_PROCESS)
+        )
+        # Persons being internal actors of a few processes
+        persons = PersonFactory.create_batch(cls.PERSONS)
+        internal_actors = [
+            # Most signatures of a person are over
+            Actor(process=process, person=person, current_state=state.name)
+            for i, person in enumerate(persons)
+            for process, state in zip(
+                processes[i % cls.PROCESSES:],
+                [SignatureState.INVITED, SignatureState.APPROVED, SignatureState.APPROVED, SignatureState.DECLINED],
+            )
+        ]
+        for actor in internal_actors:
+            actor._disable_proxy = True
+        Actor.objects.bulk_create(internal_actors)
+        cls.person = persons[0]
+        StateHistory.objects.bulk_create(
+            StateHistory(actor_id=actor_id, state=state, sequence=1)
+            for actor_id, state in Actor.objects.values_list('pk', 'current_state')
+        )
+        cls.process = processes[0]
+        cls.actor = cls.process.actors.first()
+        # Statistics of the seeded data, as the planner would have them on a real database
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_actors_of_process(self):
+        queryset = Actor.objects.filter(process=self.process)
+        self.assertIndexScan(queryset, Actor, max_rows=self.ACTORS_PER_PROCESS * 5)
+        # Latest states are read for each actor from the (actor, sequence) unique index
+        self.assertIndexScan(queryset, StateHistory)
+        self.assertNoFullScan(queryset)
+
+    def test_all_signed_lookup(self):
+        # On a page of instances, as listed by a view
+        page = SimpleModel.objects.order_by('pk').values_list('pk', flat=True)[:20]
+        queryset = SimpleModel.objects.filter(pk__in=list(page), jury__all_signed=True)
+        self.assertIndexScan(queryset, Actor, max_rows=self.ACTORS_PER_PROCESS * 5)
+        self.assertIndexScan(queryset, StateHistory)
+        self.assertNoFullScan(queryset)
+
+    def test_token_lookup(self):
+        # As done by get_actor_from_token()
+        queryset = Actor.objects.listing('signing').filter(pk=self.actor.pk)
+        self.assertIndexScan(queryset, Actor, max_rows=1)
+        self.assertNoFullScan(queryset)
+
+    def test_pending_for_person(self):
+        queryset = Actor.objects.pending_for(self.person)
+        self.assertIndexScan(queryset, Actor, index='actor_person_state_idx', max_rows=self.ACTORS_PER_PROCESS)
+        self.assertNoFullScan(queryset)
+        self.assertIndexScan(
+            Actor.objects.get_queryset().filter(person=self.person, current_state=SignatureState.INVITED.name),
+            Actor,
+            index='actor_person_state_idx',
+        )
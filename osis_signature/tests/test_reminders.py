@@ -0,0 +1,103 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, StateHistory
+from osis_signature.reminders import send_reminders
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
+
+SENT_REMINDERS = []
+
+
+def collect_reminders(actors):
+    SENT_REMINDERS.append(actors)
+
+
+class RemindersTestCase(TestCase):
+    def setUp(self):
+        SENT_REMINDERS.clear()
+        self.process = ProcessFactory()
+        self.actors = ActorFactory.create_batch(4, process=self.process, external=True)
+        for actor in self.actors:
+            actor.switch_state(SignatureState.INVITED)
+        self.age(self.actors[:3])
+
+    def age(self, actors, days=8):
+        Actor.objects.filter(pk__in=[actor.pk for actor in actors]).update(
+            notified_at=timezone.now() - timedelta(days=days),
+        )
+
+    def test_send_reminders(self):
+        # Due actors, then for each batch: savepoint, lock, update and release
+        with self.assertNumQueries(9):
+            sent = send_reminders(collect_reminders, days=7, max_reminders=2, batch_size=2)
+        self.assertEqual(sent, 3)
+        self.assertEqual([len(actors) for actors in SENT_REMINDERS], [2, 1])
+        self.assertEqual(SENT_REMINDERS[0][0].email, self.actors[0].email)
+        self.assertEqual(
+            list(self.process.actors.order_by('pk').values_list('reminder_count', flat=True)),
+            [1, 1, 1, 0],
+        )
+        # No history entry added
+        self.assertEqual(StateHistory.objects.filter(actor__process=self.process).count(), 4)
+
+        self.assertEqual(send_reminders(collect_reminders, days=7, max_reminders=2), 0)
+        self.age(self.actors)
+        self.assertEqual(send_reminders(collect_reminders, days=7, max_reminders=2), 4)
+        self.age(self.actors)
+        self.assertEqual(send_reminders(collect_reminders, days=7, max_reminders=2), 1)
+
+        # Inviting again starts over
+        actor = Actor.objects.get(pk=self.actors[0].pk)
+        actor.switch_state(SignatureState.INVITED)
+        actor.refresh_from_db()
+        self.assertEqual(actor.reminder_count, 0)
+
+    def test_failing_sender(self):
+        def failing_sender(actors):
+            raise ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            send_reminders(failing_sender, days=7, max_reminders=2)
+        self.assertFalse(self.process.actors.filter(reminder_count__gt=0).exists())
+
+    def test_command(self):
+        with self.assertRaises(CommandError):
+            call_command('send_reminders')
+        stdout = StringIO()
+        with override_settings(
+            OSIS_SIGNATURE_REMINDER_SENDER='osis_signature.tests.test_reminders.collect_reminders',
+            OSIS_SIGNATURE_REMINDER_DAYS=7,
+        ):
+            call_command('send_reminders', stdout=stdout)
+        self.assertIn('3 reminder(s) sent', stdout.getvalue())
+        self.assertEqual(len(SENT_REMINDERS), 1)
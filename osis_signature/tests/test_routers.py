@@ -0,0 +1,135 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from base.models.person import Person
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, StateHistory, clone_processes
+from osis_signature.routers import SignatureReadReplicaRouter, get_read_database, primary_pinning_scope
+from osis_signature.templatetags.osis_signature import signature_table
+from osis_signature.tests.factories import ActorFactory
+
+
+@override_settings(OSIS_SIGNATURE_READ_DATABASE='replica')
+class RoutersTestCase(TestCase):
+    def setUp(self):
+        # Simulate a fresh request, without any previous write
+        request_started.send(sender=self.__class__)
+
+    @override_settings(OSIS_SIGNATURE_READ_DATABASE=None)
+    def test_read_database_without_replica(self):
+        self.assertIsNone(get_read_database())
+        ActorFactory(external=True).switch_state(SignatureState.INVITED)
+        self.assertIsNone(get_read_database())
+
+    def test_read_database(self):
+        self.assertEqual(get_read_database(), 'replica')
+        self.assertEqual(get_read_database(RequestFactory().get('/')), 'replica')
+        self.assertEqual(get_read_database(RequestFactory().post('/')), 'default')
+
+    def test_read_after_write(self):
+        actor = ActorFactory(external=True)
+        request_started.send(sender=self.__class__)
+        self.assertEqual(signature_table({}, actor.process)['actors'].db, 'replica')
+
+        actor.switch_state(SignatureState.INVITED)
+        self.assertEqual(get_read_database(), 'default')
+        self.assertEqual(signature_table({}, actor.process)['actors'].db, 'default')
+
+        request_started.send(sender=self.__class__)
+        self.assertEqual(get_read_database(), 'replica')
+
+    def test_router(self):
+        router = SignatureReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Actor), 'replica')
+        self.assertEqual(router.db_for_read(StateHistory), 'replica')
+        self.assertIsNone(router.db_for_read(Person))
+        self.assertEqual(router.db_for_write(Actor), 'default')
+        self.assertIsNone(router.db_for_write(Person))
+        self.assertFalse(router.allow_migrate('replica', 'osis_signature'))
+        self.assertIsNone(router.allow_migrate('default', 'osis_signature'))
+
+        ActorFactory(external=True)
+        self.assertEqual(router.db_for_read(Actor), 'default')
+
+    def test_read_after_bulk_write(self):
+        actor = ActorFactory(external=True)
+        request_started.send(sender=self.__class__)
+        Actor.objects.filter(pk=actor.pk).switch_state(SignatureState.INVITED)
+        self.assertEqual(get_read_database(), 'default')
+
+        request_started.send(sender=self.__class__)
+        clone_processes([actor.process], 1, copy_states=False)
+        self.assertEqual(get_read_database(), 'default')
+
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(get_read_database(), 'replica')
+
+    def test_primary_pinning_scope(self):
+        actor = ActorFactory(external=True)
+        request_started.send(sender=self.__class__)
+        with primary_pinning_scope():
+            actor.switch_state(SignatureState.INVITED)
+            self.assertEqual(get_read_database(), 'default')
+        self.assertEqual(get_read_database(), 'replica')
+
+        @primary_pinning_scope()
+        def task():
+            Actor.objects.filter(pk=actor.pk).switch_state(SignatureState.APPROVED)
+
+        task()
+        self.assertEqual(get_read_database(), 'replica')
+
+
+@skipUnless('replica' in settings.DATABASES, "Needs a 'replica' database, e.g. a test mirror of 'default'")
+@override_settings(
+    OSIS_SIGNATURE_READ_DATABASE='replica',
+    DATABASE_ROUTERS=['osis_signature.routers.SignatureReadReplicaRouter'],
+)
+class ReplicaRoutingTestCase(TransactionTestCase):
+    # Writes are committed, to be readable from the replica connection. Databases of skipped test cases are still
+    # checked, hence only declared when configured
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def test_routing(self):
+        process = ActorFactory(external=True).process
+        request_started.send(sender=self.__class__)
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            list(Actor.objects.filter(process=process))
+        self.assertEqual(len(replica_queries), 1)
+
+        Actor.objects.filter(process=process).switch_state(SignatureState.INVITED)
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            with CaptureQueriesContext(connections['default']) as primary_queries:
+                list(Actor.objects.filter(process=process))
+        self.assertEqual(len(replica_queries), 0)
+        self.assertEqual(len(primary_queries), 1)
@@ -0,0 +1,123 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+from django.test import TestCase
+
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor
+from osis_signature.signals import in_executor, state_changed
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
+
+
+class StateChangedSignalTestCase(TestCase):
+    def setUp(self):
+        self.batches = []
+        self.process = ProcessFactory()
+        self.actors = ActorFactory.create_batch(3, process=self.process, external=True)
+
+    def connect(self, receiver):
+        state_changed.connect(receiver, weak=False)
+        self.addCleanup(state_changed.disconnect, receiver)
+
+    def receiver(self, sender, transitions, using, **kwargs):
+        self.batches.append(transitions)
+
+    def test_transitions_sent_after_commit_in_one_batch(self):
+        self.connect(self.receiver)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for actor in self.actors:
+                    actor.switch_state(SignatureState.INVITED)
+                self.actors[0].switch_state(SignatureState.APPROVED)
+            self.assertEqual(self.batches, [])
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(
+            [(t.actor, t.previous_state, t.state) for t in self.batches[0]],
+            [(actor, SignatureState.NOT_INVITED.name, SignatureState.INVITED.name) for actor in self.actors]
+            + [(self.actors[0], SignatureState.INVITED.name, SignatureState.APPROVED.name)],
+        )
+
+        # Another transaction, another batch
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actors[1].switch_state(SignatureState.DECLINED)
+        self.assertEqual(len(self.batches), 2)
+        self.assertEqual(self.batches[1][0].entry.state, SignatureState.DECLINED.name)
+
+    def test_single_flush_per_transaction(self):
+        self.connect(self.receiver)
+        actors = ActorFactory.create_batch(97, process=self.process, external=True) + self.actors
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for actor in actors:
+                    actor.switch_state(SignatureState.INVITED)
+        self.assertEqual(len(callbacks), 1)
+        # Nothing to check against the database before sending
+        with self.assertNumQueries(0):
+            callbacks[0]()
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(len(self.batches[0]), 100)
+
+    def test_rolled_back_transitions_not_sent(self):
+        self.connect(self.receiver)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.actors[0].switch_state(SignatureState.INVITED)
+                try:
+                    with transaction.atomic():
+                        self.actors[1].switch_state(SignatureState.INVITED)
+                        raise ValueError
+                except ValueError:
+                    pass
+                self.actors[2].switch_state(SignatureState.INVITED)
+        self.assertEqual([[t.actor for t in batch] for batch in self.batches], [[self.actors[0], self.actors[2]]])
+
+        # Nothing sent when all transitions are rolled back
+        self.batches.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.actors[0].switch_state(SignatureState.APPROVED)
+                    raise ValueError
+            except ValueError:
+                pass
+            self.actors[1].switch_state(SignatureState.INVITED)
+        self.assertEqual([[t.actor for t in batch] for batch in self.batches], [[self.actors[1]]])
+
+    def test_receiver_errors_and_executor(self):
+        def failing_receiver(**kwargs):
+            raise RuntimeError
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.connect(failing_receiver)
+        self.connect(in_executor(executor)(self.receiver))
+        with self.assertLogs('osis_signature.signals', level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.actors[0].switch_state(SignatureState.INVITED)
+        executor.shutdown(wait=True)
+        self.assertEqual(len(self.batches), 1)
+        self.assertIsInstance(self.batches[0][0].actor, Actor)
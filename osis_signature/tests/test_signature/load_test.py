@@ -0,0 +1,209 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+"""
+Load test of the signing workflow of the test app, driving concurrent invite, open-link and submit flows through its
+views (SendInviteView and SigningView) to reproduce deadline-day load.
+
+Runs against the configured database: use a file SQLite database or a local PostgreSQL one (an in-memory SQLite
+database can only be used with a concurrency of 1), see the signature_load_test command.
+"""
+import logging
+import math
+import multiprocessing
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.db import connection, connections, models
+from django.http import HttpResponse
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, StateHistory
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
+from osis_signature.tests.test_signature import urls
+from osis_signature.utils import get_signing_token
+from reference.tests.factories.country import CountryFactory
+
+logger = logging.getLogger(__name__)
+
+STEPS = ['invite', 'open', 'submit']
+EXECUTORS = {
+    'threads': ThreadPoolExecutor,
+    'processes': ProcessPoolExecutor,
+}
+
+# Views of the test app redirect to the home page of the project they are included in
+urlpatterns = urls.urlpatterns + [path('', lambda request: HttpResponse(), name='home')]
+
+RequestResult = namedtuple('RequestResult', ['step', 'actor_pk', 'status', 'duration', 'queries'])
+StepReport = namedtuple('StepReport', [
+    'step', 'requests', 'errors', 'throughput', 'p50', 'p95', 'p99', 'avg_queries', 'max_queries',
+])
+IntegrityIssue = namedtuple('IntegrityIssue', ['actor_pk', 'message'])
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def get_client(actor_pk):
+    # One address per actor, as on deadline day, so that throttling applies per actor rather than to all of them
+    return Client(REMOTE_ADDR='10.{}.{}.{}'.format(actor_pk >> 16 & 255, actor_pk >> 8 & 255, actor_pk & 255))
+
+
+def get_request(step, actor_pk):
+    """URL and POST data (None for a GET request) of a step of the flow of an actor"""
+    if step == 'invite':
+        return reverse('send-invite', kwargs={'pk': actor_pk}), {}
+    # Sent by the invitation, hence not timed as part of the step
+    url = reverse('sign', kwargs={'token': get_signing_token(Actor.objects.get(pk=actor_pk))})
+    return url, {'submitted': 'approved', 'comment': "Load test"} if step == 'submit' else None
+
+
+def run_flow(step, actor_pk, submissions=1):
+    """Run a step of the flow of an actor, return one result per request"""
+    client = get_client(actor_pk)
+    results = []
+    try:
+        url, data = get_request(step, actor_pk)
+    except Exception as e:
+        # E.g. the actor has not been invited
+        logger.warning("%s failed for actor %s: %r", step, actor_pk, e)
+        return [RequestResult(step, actor_pk, 500, 0, 0)]
+    # Repeated submissions use the same link, as a double click would
+    for _ in range(submissions if step == 'submit' else 1):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            try:
+                status = (client.get(url) if data is None else client.post(url, data)).status_code
+            except Exception as e:
+                # Raised by the view (e.g. a locked SQLite database), as a 500 response would be
+                logger.warning("%s failed for actor %s: %r", step, actor_pk, e)
+                status = 500
+            duration = time.perf_counter() - start
+        results.append(RequestResult(step, actor_pk, status, duration, len(queries)))
+    return results
+
+
+def run_worker_flow(step, actor_pk, submissions=1):
+    try:
+        return run_flow(step, actor_pk, submissions)
+    finally:
+        # Connections of workers are not closed by the request cycle of the test client
+        connection.close()
+
+
+def run_step(step, actor_pks, concurrency, executor, submissions=1):
+    """Run a step for all actors, return its results and its duration"""
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [result for actor_pk in actor_pks for result in run_flow(step, actor_pk, submissions)]
+    else:
+        # Forked processes must not share the connection of the parent
+        connections.close_all()
+        # Forked rather than spawned, to inherit the set up of Django and the overridden settings
+        kwargs = {'mp_context': multiprocessing.get_context('fork')} if executor == 'processes' else {}
+        with EXECUTORS[executor](max_workers=concurrency, **kwargs) as pool:
+            futures = [pool.submit(run_worker_flow, step, actor_pk, submissions) for actor_pk in actor_pks]
+            results = [result for future in futures for result in future.result()]
+    return results, time.perf_counter() - start
+
+
+def build_report(step, results, duration):
+    durations = sorted(result.duration for result in results)
+    queries = [result.queries for result in results]
+    return StepReport(
+        step=step,
+        requests=len(results),
+        # Redirects are the expected responses of POST requests
+        errors=sum(1 for result in results if result.status >= 400),
+        throughput=len(results) / duration if duration else 0,
+        p50=percentile(durations, 50),
+        p95=percentile(durations, 95),
+        p99=percentile(durations, 99),
+        avg_queries=sum(queries) / len(queries) if queries else 0,
+        max_queries=max(queries, default=0),
+    )
+
+
+def check_integrity(actor_pks, approved_pks):
+    """
+    Flag duplicate state rows (a state recorded twice in a row, or the same sequence twice) and lost updates (a
+    current state not matching the last recorded one, or a successful submit without its approval recorded)
+    """
+    issues = []
+    history = {actor_pk: [] for actor_pk in actor_pks}
+    for actor_id, state, sequence in StateHistory.objects.filter(actor__in=actor_pks).order_by(
+        'actor', 'sequence', 'pk'
+    ).values_list('actor', 'state', 'sequence'):
+        history[actor_id].append((state, sequence))
+    current_states = dict(models.QuerySet(Actor).filter(pk__in=actor_pks).values_list('pk', 'current_state'))
+    for actor_pk, entries in history.items():
+        states = [state for state, _ in entries]
+        sequences = [sequence for _, sequence in entries]
+        if len(set(sequences)) != len(sequences) or any(a == b for a, b in zip(states, states[1:])):
+            issues.append(IntegrityIssue(actor_pk, "Duplicate state rows: {}".format(entries)))
+        last_state = states[-1] if states else SignatureState.NOT_INVITED.name
+        if current_states[actor_pk] != last_state:
+            issues.append(IntegrityIssue(
+                actor_pk,
+                "Lost update: current state {} instead of {}".format(current_states[actor_pk], last_state),
+            ))
+        if actor_pk in approved_pks and states.count(SignatureState.APPROVED.name) != 1:
+            issues.append(IntegrityIssue(actor_pk, "Lost update: submitted but states are {}".format(states)))
+    return issues
+
+
+def create_actors(count):
+    process = ProcessFactory()
+    ActorFactory.create_batch(count, process=process, external=True, country=CountryFactory())
+    return process, list(process.actors.order_by('pk').values_list('pk', flat=True))
+
+
+def run_load_test(actors=100, concurrency=10, executor='threads', submissions=1, keep=False):
+    """
+    Run the invite, open-link and submit steps for new actors, `submissions` times the submit of each actor (e.g. 2 to
+    simulate double submissions). Return the report of each step and the integrity issues found.
+    """
+    process, actor_pks = create_actors(actors)
+    reports = []
+    try:
+        with override_settings(ROOT_URLCONF=__name__):
+            for step in STEPS:
+                results, duration = run_step(step, actor_pks, concurrency, executor, submissions)
+                reports.append(build_report(step, results, duration))
+        # Results of the last step, submitting
+        issues = check_integrity(actor_pks, {result.actor_pk for result in results if result.status < 400})
+    finally:
+        if not keep:
+            process.delete()
+    return reports, issues
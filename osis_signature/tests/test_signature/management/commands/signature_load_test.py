@@ -0,0 +1,76 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from osis_signature.tests.test_signature.load_test import EXECUTORS, run_load_test
+
+
+class Command(BaseCommand):
+    help = "Drive concurrent invite, open-link and submit flows through the test app views and report their timings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--actors', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--mode', choices=sorted(EXECUTORS), default='threads')
+        parser.add_argument(
+            '--submissions',
+            type=int,
+            default=1,
+            help="Number of submits per actor, more than 1 simulates double submissions (expected to be rejected)",
+        )
+        parser.add_argument('--keep', action='store_true', help="Keep the created process and actors")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > 1 and connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError("An in-memory SQLite database can only be load tested with a concurrency of 1")
+        reports, issues = run_load_test(
+            actors=options['actors'],
+            concurrency=options['concurrency'],
+            executor=options['mode'],
+            submissions=options['submissions'],
+            keep=options['keep'],
+        )
+        self.stdout.write("{:<8}{:>10}{:>8}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+            'step', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'avg q', 'max q',
+        ))
+        for report in reports:
+            self.stdout.write("{:<8}{:>10}{:>8}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10}".format(
+                report.step,
+                report.requests,
+                report.errors,
+                report.throughput,
+                report.p50 * 1000,
+                report.p95 * 1000,
+                report.p99 * 1000,
+                report.avg_queries,
+                report.max_queries,
+            ))
+        for issue in issues:
+            self.stdout.write(self.style.ERROR("Actor {}: {}".format(issue.actor_pk, issue.message)))
+        if issues:
+            raise CommandError("{} integrity issue(s) found".format(len(issues)))
+        self.stdout.write(self.style.SUCCESS("No duplicate state rows nor lost updates"))
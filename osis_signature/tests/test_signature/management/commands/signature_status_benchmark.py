@@ -0,0 +1,112 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from base.tests.factories.user import UserFactory
+from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, Process
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
+from osis_signature.tests.test_signature.load_test import percentile
+from reference.tests.factories.country import CountryFactory
+
+# Rendering the table of each process, as done by pages polled for statuses
+TABLE_TEMPLATE = Template(
+    '{% load osis_signature %}{% for process in processes %}{% signature_table process %}{% endfor %}'
+)
+
+
+def measure(function, calls):
+    """Durations, queries (of the last call) and result of the last call of a function called `calls` times"""
+    durations = []
+    for _ in range(calls):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = function()
+            durations.append(time.perf_counter() - start)
+    return sorted(durations), len(queries), result
+
+
+class Command(BaseCommand):
+    help = "Compare polling the status of processes with the JSON status endpoint to rendering their signature tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=100, help="Process uuids per call")
+        parser.add_argument('--actors', type=int, default=5, help="Actors per process")
+        parser.add_argument('--calls', type=int, default=20)
+
+    def handle(self, *args, **options):
+        country = CountryFactory()
+        processes = ProcessFactory.create_batch(options['processes'])
+        for process in processes:
+            ActorFactory.create_batch(options['actors'], process=process, external=True, country=country)
+        Actor.objects.filter(process__in=processes, order=0).switch_state(SignatureState.INVITED)
+        # Allowed to see all processes
+        user = UserFactory(is_superuser=True)
+        try:
+            with override_settings(ROOT_URLCONF='osis_signature.urls'):
+                self.run_benchmark(processes, user, options['calls'])
+        finally:
+            Process.objects.filter(pk__in=[process.pk for process in processes]).delete()
+            user.delete()
+
+    def run_benchmark(self, processes, user, calls):
+        client = Client()
+        client.force_login(user)
+        url = '{}?uuids={}'.format(reverse('processes-status'), ','.join(str(process.uuid) for process in processes))
+        json_durations, json_queries, response = measure(lambda: client.get(url), calls)
+        etag = response['ETag']
+        not_modified_durations, not_modified_queries, not_modified = measure(
+            lambda: client.get(url, HTTP_IF_NONE_MATCH=etag),
+            calls,
+        )
+        if response.status_code != 200 or not_modified.status_code != 304:
+            raise CommandError("Unexpected responses: {}, {}".format(response.status_code, not_modified.status_code))
+        table_durations, table_queries, html = measure(
+            lambda: TABLE_TEMPLATE.render(Context({'processes': processes})),
+            calls,
+        )
+
+        self.stdout.write("{} processes per poll, {} calls".format(len(processes), calls))
+        self.stdout.write("{:<16}{:>10}{:>10}{:>10}{:>12}".format('', 'p50 ms', 'p95 ms', 'queries', 'bytes'))
+        for name, durations, queries, size in [
+            ('json', json_durations, json_queries, len(response.content)),
+            ('json (304)', not_modified_durations, not_modified_queries, len(not_modified.content)),
+            ('signature_table', table_durations, table_queries, len(html)),
+        ]:
+            self.stdout.write("{:<16}{:>10.1f}{:>10.1f}{:>10}{:>12}".format(
+                name,
+                percentile(durations, 50) * 1000,
+                percentile(durations, 95) * 1000,
+                queries,
+                size,
+            ))
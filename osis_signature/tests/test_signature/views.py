@@ -35,6 +35,7 @@ from osis_signature.contrib.forms import CommentSigningForm
 from osis_signature.contrib.mixins import ActorFormsetMixin
 from osis_signature.enums import SignatureState
 from osis_signature.models import Actor
+from osis_signature.routers import get_read_database
 from osis_signature.tests.test_signature.forms import SpecialActorForm
 from osis_signature.tests.test_signature.models import SimpleModel, SpecialActor, DoubleModel
 from osis_signature.utils import get_signing_token, get_actor_from_token
@@ -83,7 +84,12 @@ class SigningView(generic.UpdateView):
     success_url = reverse_lazy('home')
 
     def get_object(self, queryset=None):
-        actor = get_actor_from_token(self.kwargs['token'])
+        actor = get_actor_from_token(
+            self.kwargs['token'],
+            using=get_read_database(self.request),
+            profile='signing',
+            request=self.request,
+        )
         if not actor:
             raise Http404
         return actor
@@ -24,8 +24,9 @@
 #
 # ##############################################################################
 from django.template import Context, Template
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 
+from osis_signature.enums import SignatureState
 from osis_signature.tests.factories import ActorFactory, ProcessFactory
 
 
@@ -51,3 +52,45 @@ class TemplateTagsTestCase(TestCase):
         self.assertIn('<table', rendered)
         self.assertInHTML('Foo', rendered)
         self.assertInHTML('Bar', rendered)
+
+    def test_pending_signatures_count(self):
+        actor = ActorFactory()
+        actor.switch_state(SignatureState.INVITED)
+        context = Context({'person': actor.person})
+        rendered = Template(
+            '{% load osis_signature %}'
+            '{% pending_signatures_count person %}'
+        ).render(context)
+        self.assertEqual(rendered, '1')
+        self.assertEqual(Template(
+            '{% load osis_signature %}'
+            '{% pending_signatures_count None %}'
+        ).render(Context()), '0')
+
+    def test_paginated_table(self):
+        process = ProcessFactory()
+        # Distinct names, to tell pages apart
+        actors = [ActorFactory(process=process, person__first_name='Actor{}'.format(i)) for i in range(5)]
+        template = Template(
+            '{% load osis_signature %}'
+            '{% signature_table value page_size=2 %}'
+        )
+        rendered = template.render(Context({'value': process}))
+        self.assertIn(actors[1].first_name, rendered)
+        self.assertNotIn(actors[2].first_name, rendered)
+        self.assertNotIn('actors_before', rendered)
+        self.assertIn('?actors_after={}'.format(actors[1].pk), rendered)
+
+        request = RequestFactory().get('/', {'actors_after': actors[3].pk, 'foo': 'bar'})
+        rendered = template.render(Context({'value': process, 'request': request}))
+        self.assertIn(actors[4].first_name, rendered)
+        self.assertNotIn(actors[3].first_name, rendered)
+        self.assertNotIn('actors_after', rendered)
+        self.assertIn('?foo=bar&amp;actors_before={}'.format(actors[4].pk), rendered)
+
+        request = RequestFactory().get('/', {'actors_before': actors[4].pk})
+        rendered = template.render(Context({'value': process, 'request': request}))
+        self.assertIn(actors[2].first_name, rendered)
+        self.assertIn(actors[3].first_name, rendered)
+        self.assertIn('?actors_before={}'.format(actors[2].pk), rendered)
+        self.assertIn('?actors_after={}'.format(actors[3].pk), rendered)
@@ -0,0 +1,136 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from osis_signature.enums import SignatureState
+from osis_signature.tests.factories import ActorFactory
+from osis_signature.throttling import (
+    RateLimit,
+    VerificationThrottled,
+    get_cache,
+    get_verification_counters,
+    reset_verification_counters,
+)
+from osis_signature.utils import get_actor_from_token, get_signing_token
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttling'}},
+)
+class ThrottlingTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+
+    def test_rate_limit(self):
+        limit = RateLimit('limit', '2/m')
+        self.assertTrue(limit.consume(now=0))
+        self.assertTrue(limit.consume(now=10))
+        self.assertFalse(limit.consume(now=59))
+        # Next window
+        self.assertTrue(limit.consume(now=60))
+
+    @override_settings(OSIS_SIGNATURE_VERIFICATION_RATES={'client': '3/m', 'token': None})
+    def test_throttled_by_client(self):
+        for i in range(3):
+            self.assertIsNone(get_actor_from_token('bad-token-{}'.format(i), request=self.request))
+        with self.assertNumQueries(0), self.assertRaises(VerificationThrottled):
+            get_actor_from_token('bad-token', request=self.request)
+        # Not throttled without request, e.g. when called internally
+        self.assertIsNone(get_actor_from_token('bad-token'))
+        other_request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2')
+        self.assertIsNone(get_actor_from_token('bad-token', request=other_request))
+        self.assertEqual(get_verification_counters(), {'accepted': 0, 'rejected': 4, 'throttled': 1})
+        reset_verification_counters()
+        self.assertEqual(get_verification_counters(), {'accepted': 0, 'rejected': 0, 'throttled': 0})
+
+    @override_settings(OSIS_SIGNATURE_VERIFICATION_RATES={'client': None, 'token': '2/m'})
+    def test_throttled_by_token(self):
+        actor = ActorFactory(external=True)
+        actor.switch_state(SignatureState.INVITED)
+        token = get_signing_token(actor)
+        self.assertEqual(get_actor_from_token(token, request=self.request), actor)
+        # Former tokens of the same actor share its limit
+        actor.switch_state(SignatureState.INVITED)
+        self.assertIsNone(get_actor_from_token(token, request=self.request))
+        other_request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2')
+        with self.assertRaises(VerificationThrottled):
+            get_actor_from_token(get_signing_token(actor), request=other_request)
+        self.assertEqual(get_verification_counters(), {'accepted': 1, 'rejected': 1, 'throttled': 1})
+
+        # Tokens of other actors are not throttled
+        other_actor = ActorFactory(external=True)
+        other_actor.switch_state(SignatureState.INVITED)
+        other_token = get_signing_token(other_actor)
+        self.assertEqual(get_actor_from_token(other_token, request=self.request), other_actor)
+
+        # Invalid tokens (e.g. tampered signature or timestamp, random tokens) all share the same limit
+        payload, timestamp, signature = other_token.split(':')
+        for invalid_token in [
+            ':'.join([payload, timestamp, signature[:-3] + 'abc']),
+            ':'.join([payload, timestamp + 'a', signature]),
+        ]:
+            self.assertIsNone(get_actor_from_token(invalid_token, request=self.request))
+        with self.assertRaises(VerificationThrottled):
+            get_actor_from_token('random-token', request=self.request)
+        self.assertEqual(get_actor_from_token(other_token, request=self.request), other_actor)
+
+    @override_settings(
+        OSIS_SIGNATURE_VERIFICATION_RATES={'client': '1/m', 'token': None},
+        ROOT_URLCONF='osis_signature.tests.test_signature.urls',
+    )
+    def test_signing_view(self):
+        url = reverse('sign', kwargs={'token': 'bad-token'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    @override_settings(
+        OSIS_SIGNATURE_VERIFICATION_RATES={'client': '1/m'},
+        OSIS_SIGNATURE_THROTTLE_CLIENT_KEY='osis_signature.tests.test_throttling.get_forwarded_client',
+    )
+    def test_client_key_resolver(self):
+        self.request.META['HTTP_X_FORWARDED_FOR'] = '192.168.0.1'
+        self.assertIsNone(get_actor_from_token('bad-token', request=self.request))
+        # Same proxy address, another client
+        other_request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.168.0.2')
+        self.assertIsNone(get_actor_from_token('bad-token', request=other_request))
+        with self.assertRaises(VerificationThrottled):
+            get_actor_from_token('bad-token', request=self.request)
+
+    def test_client_rate_disabled_by_default(self):
+        actor = ActorFactory(external=True)
+        actor.switch_state(SignatureState.INVITED)
+        # Random tokens are still throttled, by their shared limit, without affecting valid tokens
+        for i in range(10):
+            self.assertIsNone(get_actor_from_token('bad-token-{}'.format(i), request=self.request))
+        with self.assertRaises(VerificationThrottled):
+            get_actor_from_token('bad-token', request=self.request)
+        self.assertEqual(get_actor_from_token(get_signing_token(actor), request=self.request), actor)
+
+
+def get_forwarded_client(request):
+    return request.META['HTTP_X_FORWARDED_FOR']
@@ -24,9 +24,14 @@
 #
 # ##############################################################################
 
-from django.test import TestCase
+from datetime import timedelta
+
+from django.core import signing
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from osis_signature.enums import SignatureState
+from osis_signature.models import Actor, StateHistory
 from osis_signature.tests.factories import ActorFactory
 from osis_signature.utils import get_actor_from_token, get_signing_token
 
@@ -52,6 +57,30 @@ class UtilsTestCase(TestCase):
         self.assertIsNone(get_actor_from_token(old_token))
         self.assertEqual(get_actor_from_token(good_token), actor)
 
+    def test_get_actor_legacy_token(self):
+        actor = ActorFactory(external=True)
+        actor.switch_state(SignatureState.INVITED)
+        token = signing.dumps({
+            'date': actor.states.last().created_at.isoformat(),
+            'pk': actor.pk,
+        })
+        self.assertEqual(get_actor_from_token(token), actor)
+
+        actor.switch_state(SignatureState.INVITED)
+        self.assertIsNone(get_actor_from_token(token))
+
+    @override_settings(OSIS_SIGNATURE_INVITATION_DAYS=7)
+    def test_get_actor_expired_invitation(self):
+        actor = ActorFactory(external=True)
+        actor.switch_state(SignatureState.INVITED)
+        token = get_signing_token(actor)
+        self.assertEqual(get_actor_from_token(token), actor)
+
+        StateHistory.objects.filter(actor=actor).update(created_at=timezone.now() - timedelta(days=8))
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_actor_from_token(token))
+        self.assertTrue(Actor.objects.get(pk=actor.pk).is_invitation_expired)
+
     def test_get_actor_bad_token(self):
         self.assertIsNone(get_actor_from_token('bad-token'))
 
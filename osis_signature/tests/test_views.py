@@ -23,6 +23,8 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
+import uuid
+
 from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase, override_settings, RequestFactory
 from django.urls import reverse
@@ -31,10 +33,16 @@ from django.views import generic
 from base.tests.factories.person import PersonFactory
 from base.tests.factories.user import UserFactory
 from osis_signature.contrib.mixins import ActorFormsetMixin
+from osis_signature.enums import SignatureState
 from osis_signature.models import Process, Actor
+from osis_signature.tests.factories import ActorFactory, ProcessFactory
 from osis_signature.tests.test_signature.models import DoubleModel, SimpleModel
 
 
+def is_process_actor(request, process):
+    return process.actors.filter(person__user=request.user).exists()
+
+
 @override_settings(ROOT_URLCONF='osis_signature.urls')
 class ViewsTestCase(TestCase):
     def test_person_autocomplete(self):
@@ -46,6 +54,75 @@ class ViewsTestCase(TestCase):
         response = self.client.get(reverse("person-autocomplete"))
         self.assertEqual(len(response.json()['results']), 1)
 
+    def test_processes_status(self):
+        processes = ProcessFactory.create_batch(2)
+        actors = [
+            ActorFactory(process=processes[0], order=1),
+            ActorFactory(process=processes[0], external=True, order=0),
+            ActorFactory(process=processes[1], external=True),
+        ]
+        actors[0].switch_state(SignatureState.INVITED)
+        url = '{}?uuids={},{}'.format(reverse("processes-status"), processes[0].uuid, processes[1].uuid)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(UserFactory(is_superuser=True))
+        with self.assertNumQueries(4):  # Session, user, processes and all actors
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['fields'], ['uuid', 'first_name', 'last_name', 'state', 'state_date'])
+        self.assertEqual([actor[0] for actor in data['processes'][str(processes[0].uuid)]], [
+            str(actors[1].uuid),
+            str(actors[0].uuid),
+        ])
+        self.assertEqual(data['processes'][str(processes[0].uuid)][1][1:4], [
+            actors[0].person.first_name,
+            actors[0].person.last_name,
+            SignatureState.INVITED.name,
+        ])
+        self.assertEqual(len(data['processes'][str(processes[1].uuid)]), 1)
+
+        # Unchanged
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        actors[2].switch_state(SignatureState.INVITED)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        self.assertEqual(self.client.get(reverse("processes-status") + '?uuids=foo').status_code, 400)
+        self.assertEqual(self.client.get(reverse("processes-status")).status_code, 400)
+        with self.settings(OSIS_SIGNATURE_STATUS_MAX_PROCESSES=1):
+            self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_processes_status_permission(self):
+        processes = ProcessFactory.create_batch(2)
+        actor = ActorFactory(process=processes[0])
+        ActorFactory(process=processes[1])
+        unknown_uuid = uuid.uuid4()
+        url = '{}?uuids={}'.format(
+            reverse("processes-status"),
+            ','.join(str(value) for value in [processes[0].uuid, processes[1].uuid, unknown_uuid]),
+        )
+
+        # Denied by default, unless allowed by object permissions
+        self.client.force_login(UserFactory())
+        self.assertEqual(self.client.get(url).json()['processes'], {})
+        self.client.force_login(UserFactory(is_superuser=True))
+        self.assertEqual(self.client.get(url).json()['processes'].keys(), {
+            str(processes[0].uuid),
+            str(processes[1].uuid),
+        })
+
+        user = UserFactory()
+        actor.person.user = user
+        actor.person.save()
+        self.client.force_login(user)
+        with self.settings(OSIS_SIGNATURE_STATUS_PERMISSION='osis_signature.tests.test_views.is_process_actor'):
+            self.assertEqual(self.client.get(url).json()['processes'].keys(), {str(processes[0].uuid)})
+
 
 @override_settings(ROOT_URLCONF='osis_signature.tests.test_signature.urls')
 class MixinTestCase(TestCase):
@@ -85,6 +162,29 @@ class MixinTestCase(TestCase):
         self.assertEqual(Process.objects.count(), 1)
         self.assertEqual(Actor.objects.count(), 2)
 
+    def test_ordered_mixin(self):
+        class OrderedUpdateView(ActorFormsetMixin, generic.UpdateView):
+            model = SimpleModel
+            fields = '__all__'
+            actors_formset_can_order = True
+
+        process = ProcessFactory()
+        actors = ActorFactory.create_batch(3, process=process)
+        instance = SimpleModel.objects.create(title='Foo', jury=process)
+        data = {'title': 'Foo', 'actors-INITIAL_FORMS': 3, 'actors-TOTAL_FORMS': 3}
+        for i, (actor, order) in enumerate(zip(actors, [3, 1, 2])):
+            data.update({
+                'actors-{}-id'.format(i): actor.pk,
+                'actors-{}-person'.format(i): actor.person_id,
+                'actors-{}-ORDER'.format(i): order,
+            })
+        response = OrderedUpdateView.as_view()(RequestFactory().post('/', data), pk=instance.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(process.actors.order_by('order').values_list('pk', flat=True)),
+            [actors[1].pk, actors[2].pk, actors[0].pk],
+        )
+
     def test_double_mixin(self):
         class DoubleCreateView(ActorFormsetMixin, generic.CreateView):
             model = DoubleModel
@@ -0,0 +1,141 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.utils.module_loading import import_string
+
+# Rates of signing token verifications: per client and per token (i.e. per actor, invalid tokens sharing the same
+# limit), None to disable. The client rate is disabled by default, clients being identified by their IP address,
+# shared by all users behind a reverse proxy
+DEFAULT_VERIFICATION_RATES = {
+    'client': None,
+    'token': '10/m',
+}
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+COUNTERS = ['accepted', 'rejected', 'throttled']
+CACHE_PREFIX = 'osis_signature:verification'
+# Shared by all tokens whose signature does not match
+INVALID_TOKEN_KEY = 'invalid'
+
+
+class VerificationThrottled(PermissionDenied):
+    pass
+
+
+def get_cache():
+    return caches[getattr(settings, 'OSIS_SIGNATURE_THROTTLE_CACHE', 'default')]
+
+
+def parse_rate(rate):
+    """Parse a rate such as '10/m' into a number of requests and a period (in seconds)"""
+    count, period = rate.split('/')
+    return int(count), RATE_PERIODS[period[0]]
+
+
+class RateLimit:
+    """
+    A fixed window counter kept in the cache, so that it is shared by processes using a shared cache. Counting relies
+    on the atomic add() and incr() of the cache, concurrent requests can't exceed the limit.
+    """
+
+    def __init__(self, key, rate, cache=None):
+        self.key = key
+        self.limit, self.period = parse_rate(rate)
+        self.cache = cache or get_cache()
+
+    def consume(self, now=None):
+        """Count a request in the current window, return whether it is within the limit"""
+        # Wall clock time, comparable between processes sharing the cache
+        now = time.time() if now is None else now
+        key = '{}:{}'.format(self.key, int(now // self.period))
+        # add() does nothing if already set
+        self.cache.add(key, 0, timeout=self.period + 1)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Expired in the meantime
+            self.cache.set(key, 1, timeout=self.period + 1)
+            count = 1
+        return count <= self.limit
+
+
+def get_client_key(request):
+    """Client IP address, see OSIS_SIGNATURE_THROTTLE_CLIENT_KEY to identify clients otherwise"""
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_client_key_resolver():
+    path = getattr(settings, 'OSIS_SIGNATURE_THROTTLE_CLIENT_KEY', None)
+    return import_string(path) if path else get_client_key
+
+
+def get_token_key(token):
+    """Key of the actor a token has been issued for, whatever the state or the timestamp of the token"""
+    # Only trusted once the signature matches (checked without any query), so that random tokens can't each get their
+    # own limit (and cache entry), all sharing the same one instead
+    try:
+        return str(signing.loads(token)['pk'])
+    except (signing.BadSignature, KeyError, TypeError):
+        return INVALID_TOKEN_KEY
+
+
+def throttle_verification(request, token):
+    """Raise VerificationThrottled if the client or the token exceeds its verification rate"""
+    rates = {**DEFAULT_VERIFICATION_RATES, **getattr(settings, 'OSIS_SIGNATURE_VERIFICATION_RATES', {})}
+    for scope, rate in rates.items():
+        if not rate:
+            continue
+        key = get_client_key_resolver()(request) if scope == 'client' else get_token_key(token)
+        if not RateLimit('{}:{}:{}'.format(CACHE_PREFIX, scope, key), rate).consume():
+            count_verification('throttled')
+            raise VerificationThrottled
+
+
+def count_verification(counter):
+    cache = get_cache()
+    key = '{}:count:{}'.format(CACHE_PREFIX, counter)
+    # add() does nothing if already set
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted in the meantime
+        cache.set(key, 1, timeout=None)
+
+
+def get_verification_counters():
+    """Number of verifications accepted, rejected (invalid token) and throttled"""
+    cache = get_cache()
+    values = cache.get_many(['{}:count:{}'.format(CACHE_PREFIX, counter) for counter in COUNTERS])
+    return {counter: values.get('{}:count:{}'.format(CACHE_PREFIX, counter), 0) for counter in COUNTERS}
+
+
+def reset_verification_counters():
+    get_cache().delete_many(['{}:count:{}'.format(CACHE_PREFIX, counter) for counter in COUNTERS])
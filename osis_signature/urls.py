@@ -23,11 +23,27 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
+from functools import lru_cache
+
 from django.urls import path
 
-from osis_signature.contrib import views
+from osis_signature.views import ProcessStatusView
+
+
+@lru_cache(maxsize=None)
+def get_person_autocomplete_view():
+    # Autocomplete views are only loaded when first requested, not when URLs are checked at startup
+    from osis_signature.contrib.views import UCLMemberAutocomplete
+
+    return UCLMemberAutocomplete.as_view()
+
+
+def person_autocomplete(request, *args, **kwargs):
+    return get_person_autocomplete_view()(request, *args, **kwargs)
+
 
 app_name = 'osis_signature'
 urlpatterns = [
-    path('person-autocomplete', views.UCLMemberAutocomplete.as_view(), name='person-autocomplete')
+    path('person-autocomplete', person_autocomplete, name='person-autocomplete'),
+    path('processes-status', ProcessStatusView.as_view(), name='processes-status'),
 ]
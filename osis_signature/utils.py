@@ -26,26 +26,53 @@
 from datetime import datetime
 
 from django.core import signing
+from django.db import models
 
 from osis_signature.models import Actor
+from osis_signature.throttling import count_verification, throttle_verification
 
 
 def get_signing_token(actor: Actor):
-    latest_state = actor.states.last()
-    if not latest_state:
+    if hasattr(actor, 'last_sequence'):
+        last_sequence = actor.last_sequence
+    elif actor.get_prefetched_states() is not None:
+        last_state = actor.get_last_state_entry()
+        last_sequence = last_state.sequence if last_state else None
+    else:
+        last_sequence = actor.states.aggregate(last_sequence=models.Max('sequence'))['last_sequence']
+    if last_sequence is None:
         raise ValueError("Can't generate token: no state recorded for this actor yet")
     return signing.dumps({
-        'date': latest_state.created_at.isoformat(),
+        'seq': last_sequence,
         'pk': actor.pk,
     })
 
 
-def get_actor_from_token(token):
+def get_actor_from_token(token, using=None, profile='notification', request=None):
+    """
+    Get the actor a signing token has been issued for, None if the token is not valid anymore. When the request is
+    given, verifications are throttled (see OSIS_SIGNATURE_VERIFICATION_RATES) and counted.
+    """
+    if request is None:
+        return _get_actor_from_token(token, using, profile)
+    # Before any signature check or query
+    throttle_verification(request, token)
+    actor = _get_actor_from_token(token, using, profile)
+    count_verification('accepted' if actor else 'rejected')
+    return actor
+
+
+def _get_actor_from_token(token, using, profile):
     try:
         payload = signing.loads(token)
     except signing.BadSignature:
         return None
-    actor = Actor.objects.filter(pk=payload['pk']).first()
-    date = datetime.fromisoformat(payload['date'])
-    if actor and actor.states.last().created_at == date:
+    actor = Actor.objects.using(using).listing(profile).filter(pk=payload['pk']).first()
+    if not actor or actor.last_sequence is None or actor.is_invitation_expired:
+        return None
+    if 'seq' in payload:
+        if actor.last_sequence == payload['seq']:
+            return actor
+    # Tokens issued before sequences were introduced are bound to the state date
+    elif actor.last_state_date == datetime.fromisoformat(payload['date']):
         return actor
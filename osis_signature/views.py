@@ -0,0 +1,110 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2021 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.utils.module_loading import import_string
+from django.views import View
+
+from osis_signature.models import Actor, ActorQuerySet, Process
+from osis_signature.routers import get_read_database
+
+# Values of each actor, in this order, in status responses
+STATUS_FIELDS = ['uuid', 'first_name', 'last_name', 'state', 'state_date']
+DEFAULT_STATUS_MAX_PROCESSES = 100
+
+
+def get_processes_status(processes, using=None):
+    """Values of the actors (see STATUS_FIELDS) of each of the given processes, by process uuid, with a single query"""
+    process_uuids = {process.pk: str(process.uuid) for process in processes}
+    status = {process_uuid: [] for process_uuid in sorted(process_uuids.values())}
+    if not status:
+        return status
+    actors = (
+        ActorQuerySet(Actor, using=using)
+        .select_related('person')
+        .filter(process__in=process_uuids.keys())
+        .listing('status')
+        .order_by('process', 'order', 'pk')
+    )
+    for actor in actors:
+        status[process_uuids[actor.process_id]].append([
+            str(actor.uuid),
+            actor.first_name,
+            actor.last_name,
+            actor.current_state,
+            actor.current_state_date.isoformat() if actor.current_state_date else None,
+        ])
+    return status
+
+
+def has_process_permission(request, process):
+    """Whether the user may poll the status of a process, from the object permissions of the host project"""
+    return request.user.has_perm('osis_signature.view_process', process)
+
+
+def get_process_permission_checker():
+    path = getattr(settings, 'OSIS_SIGNATURE_STATUS_PERMISSION', None)
+    return import_string(path) if path else has_process_permission
+
+
+class ProcessStatusView(LoginRequiredMixin, View):
+    """
+    Actors and states of several processes, given by their comma-separated uuids (`?uuids=...`), for widgets polling
+    them. Only processes allowed by `has_process_permission()` (or OSIS_SIGNATURE_STATUS_PERMISSION) are listed.
+    Responses carry an ETag, so that unchanged statuses are answered with a 304 Not Modified.
+    """
+
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        max_processes = getattr(settings, 'OSIS_SIGNATURE_STATUS_MAX_PROCESSES', DEFAULT_STATUS_MAX_PROCESSES)
+        try:
+            process_uuids = {uuid.UUID(value) for value in request.GET.get('uuids', '').split(',') if value}
+        except ValueError:
+            return JsonResponse({'error': "Invalid process uuid"}, status=400)
+        if not process_uuids or len(process_uuids) > max_processes:
+            return JsonResponse({'error': "From 1 to {} process uuids expected".format(max_processes)}, status=400)
+
+        db = get_read_database(request)
+        has_permission = get_process_permission_checker()
+        # Unknown processes, and the ones the user may not see, are left out
+        processes = [
+            process
+            for process in Process.objects.using(db).filter(uuid__in=process_uuids)
+            if has_permission(request, process)
+        ]
+        status = get_processes_status(processes, using=db)
+        content = json.dumps({'fields': STATUS_FIELDS, 'processes': status}, separators=(',', ':'))
+        response = set_response_etag(HttpResponse(content, content_type='application/json'))
+        response = get_conditional_response(request, etag=response['ETag'], response=response)
+        # Always revalidated, and only cached by the browser of the user
+        patch_cache_control(response, private=True, no_cache=True)
+        return response